@@ -1,11 +1,17 @@
 # app/controllers/api.py
-from fastapi import APIRouter, File, UploadFile, Depends, HTTPException
+import json
+import contextlib
+from fastapi import APIRouter, File, UploadFile, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..models import db as db_module
 from ..models import schemas, models
-from ..services.document_service import save_uploaded_file
-from ..services.rag_service import answer_query
+from ..services.document_service import new_upload_path, register_document, find_duplicate_document, delete_document
+from ..services.job_service import create_ingestion_job, create_reindex_job, enqueue_job, get_job, latest_job_for_document
+from ..services.rag_service import answer_query, stream_answer, answer_batch
 from ..utils.dependencies import get_db, get_current_user
+from ..utils.uploads import save_upload_to_disk, remove_file
+from ..utils import metrics
 
 router = APIRouter()
 
@@ -23,14 +29,24 @@ async def upload(
     )
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail=f"File type {file.content_type} not supported. Allowed types: {allowed_types}")
-    content = await file.read()  # read into memory; for large files streaming is recommended
-    # call service with default owner for MVP
-    doc, chunks = save_uploaded_file(fileobj=bytes_to_filelike(content), filename=file.filename, db=db, owner="mvp_user")
-    return {"message": "File uploaded successfully", "file_id": str(doc.id)}
-
-def bytes_to_filelike(b: bytes):
-    from io import BytesIO
-    return BytesIO(b)
+    # stream to disk in fixed-size blocks (size limit + content hash computed on the fly)
+    stored = await save_upload_to_disk(file, new_upload_path(file.filename))
+    owner = "mvp_user"  # default owner for MVP
+    # identical file already uploaded by this owner: link to the existing index
+    existing = find_duplicate_document(db, stored.sha256, owner=owner)
+    if existing is not None:
+        remove_file(stored.path)
+        job = latest_job_for_document(db, existing.id)
+        return {
+            "message": "Identical file already uploaded, reusing existing index",
+            "file_id": str(existing.id),
+            "job_id": job.id if job else None,
+        }
+    # indexing runs in the background job pool
+    doc = register_document(stored.path, file.filename, db, owner=owner, content_hash=stored.sha256)
+    job = create_ingestion_job(db, doc)
+    enqueue_job(job.id)
+    return {"message": "File uploaded successfully, indexing started", "file_id": str(doc.id), "job_id": job.id}
 
 @router.post("/query", response_model=schemas.QueryResponse)
 async def query(
@@ -38,7 +54,122 @@ async def query(
     db: Session = Depends(get_db)
 ):
     try:
-        out = await answer_query(req.query, top_k=5, owner="mvp_user")
-        return {"answer": out["answer"]}
+        out = await answer_query(
+            req.query, top_k=5, owner="mvp_user", pipeline=req.pipeline,
+            use_cache=req.use_cache, rerank=req.rerank,
+        )
+        return {"answer": out["answer"], "timings": out["timings"]}
     except Exception as e:
         return {"answer": f"I encountered an error: {str(e)}. Please make sure you have uploaded some documents first.", "sources": []}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/query/stream")
+async def query_stream(req: schemas.QueryRequest, request: Request):
+    """
+    Server-sent events: "sources" once retrieval is done, then "token" events
+    as the answer is generated, then "done" (or "error").
+    """
+    async def events():
+        async with contextlib.aclosing(stream_answer(
+            req.query, top_k=5, owner="mvp_user", pipeline=req.pipeline,
+            use_cache=req.use_cache, rerank=req.rerank,
+        )) as stream:
+            try:
+                async for event, data in stream:
+                    if await request.is_disconnected():
+                        # leaving the block closes the stream, which cancels the generation
+                        break
+                    yield _sse(event, data)
+            except Exception as e:
+                yield _sse("error", {"message": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# upper bound on queries accepted by one batch request
+MAX_BATCH_QUERIES = 500
+
+@router.post("/query/batch")
+async def query_batch(req: schemas.BatchQueryRequest, request: Request):
+    """
+    Answer many queries in one request. Results are streamed as NDJSON, one
+    line per query ({"index", "query", "answer", "sources", "timings"} or
+    {"index", "query", "error"}) in the order they finish.
+    """
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(req.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    if req.concurrency is not None and req.concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+
+    async def lines():
+        async with contextlib.aclosing(answer_batch(
+            req.queries, top_k=5, owner="mvp_user", concurrency=req.concurrency,
+            use_cache=req.use_cache, rerank=req.rerank,
+        )) as results:
+            async for item in results:
+                if await request.is_disconnected():
+                    break
+                yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.delete("/documents/{doc_id}", response_model=schemas.DeleteResponse)
+async def delete_document_endpoint(doc_id: int, db: Session = Depends(get_db)):
+    doc = (
+        db.query(models.Document)
+        .filter(models.Document.id == doc_id, models.Document.owner == "mvp_user")
+        .first()
+    )
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if doc.status == "pending":
+        raise HTTPException(status_code=409, detail="Document is still being indexed")
+    # removes vectors, chunk rows and the stored file; invalidates cached answers for the tenant
+    delete_document(doc, db)
+    return {"message": "Document deleted", "file_id": str(doc_id)}
+
+@router.get("/jobs/{job_id}", response_model=schemas.JobStatusResponse)
+async def job_status(job_id: str, db: Session = Depends(get_db)):
+    job = get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return schemas.JobStatusResponse(
+        job_id=job.id,
+        kind=job.kind or "ingest",
+        doc_id=job.doc_id,
+        status=job.status,
+        stage=job.stage,
+        progress_current=job.progress_current,
+        progress_total=job.progress_total,
+        error=job.error,
+        created_at=job.created_at.isoformat() if job.created_at else None,
+        updated_at=job.updated_at.isoformat() if job.updated_at else None,
+    )
+
+@router.post("/reindex", response_model=schemas.JobStatusResponse)
+async def reindex(req: schemas.ReindexRequest = None, db: Session = Depends(get_db)):
+    # rebuild the tenant's collection in the background; queries keep using the old version until the swap
+    job = create_reindex_job(
+        db, owner="mvp_user", from_source=req.from_source if req else False, profile=req.profile if req else None
+    )
+    enqueue_job(job.id)
+    return schemas.JobStatusResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        stage=job.stage,
+        progress_current=job.progress_current,
+        progress_total=job.progress_total,
+    )
+
+@router.get("/metrics")
+async def get_metrics():
+    # in-process counters / latency summaries (cache hit rates, throughput, ...)
+    return metrics.snapshot()
@@ -4,10 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from .controllers.api import router as api_router
 from .controllers.auth import router as auth_router
 from .models.db import Base, engine
+from .models.migrations import upgrade_schema
 from .tools.controller import router as tools_router
+from .services.job_service import resume_pending_jobs
 import os
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(title="Simple RAG FastAPI")
 
@@ -26,6 +29,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def resume_ingestion_jobs():
+    # pick up uploads that were still being indexed when the server stopped
+    resume_pending_jobs()
+
 app.include_router(auth_router, prefix="/api/auth", tags=["authentication"])
 app.include_router(api_router, prefix="/api", tags=["rag"])
 app.include_router(tools_router, prefix="/api/tools", tags=["tools"])
@@ -0,0 +1,37 @@
+# app/models/migrations.py
+# create_all only creates missing tables; columns added to existing tables are applied here.
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# (table, column, column DDL); rows that predate a column get the DDL's DEFAULT
+COLUMNS = [
+    # documents uploaded before background jobs were indexed synchronously
+    ("documents", "status", "VARCHAR NOT NULL DEFAULT 'indexed'"),
+    # content hashes of older rows stay NULL: they are simply never matched as duplicates
+    ("documents", "content_hash", "VARCHAR"),
+    ("chunks", "content_hash", "VARCHAR"),
+    # chunks indexed before page tracking have no citation position until a from-source reindex
+    ("chunks", "page", "INTEGER"),
+    ("chunks", "char_start", "INTEGER"),
+    ("chunks", "char_end", "INTEGER"),
+]
+
+# (index name, table, column) for indexed columns in COLUMNS
+INDEXES = [
+    ("ix_documents_content_hash", "documents", "content_hash"),
+    ("ix_chunks_content_hash", "chunks", "content_hash"),
+]
+
+def upgrade_schema(engine: Engine):
+    """Add missing columns (and their indexes) to existing tables; safe to run on every start."""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    existing = {table: {c["name"] for c in inspector.get_columns(table)} for table in tables}
+    with engine.begin() as conn:
+        for table, column, ddl in COLUMNS:
+            if table in tables and column not in existing[table]:
+                print(f"Adding column {table}.{column}")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        for name, table, column in INDEXES:
+            if table in tables:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})"))
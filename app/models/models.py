@@ -10,6 +10,8 @@ class Document(Base):
     filepath = Column(String, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     owner = Column(String, nullable=True)  # a session id or user id if needed
+    status = Column(String, nullable=False, default="pending")  # pending | indexed | failed
+    content_hash = Column(String, nullable=True, index=True)  # sha256 of the uploaded file
 
 class Chunk(Base):
     __tablename__ = "chunks"
@@ -17,6 +19,26 @@ class Chunk(Base):
     doc_id = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
     qdrant_point_id = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True, index=True)  # sha256 of the chunk text
+    page = Column(Integer, nullable=True)  # 1-based page the chunk starts on
+    char_start = Column(Integer, nullable=True)  # offsets into the normalised document text
+    char_end = Column(Integer, nullable=True)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(String, primary_key=True, index=True)  # uuid hex
+    kind = Column(String, nullable=False, default="ingest")  # ingest | reindex
+    doc_id = Column(Integer, nullable=True, index=True)  # null for reindex jobs
+    owner = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | running | completed | failed
+    stage = Column(String, nullable=False, default="queued")  # extracting | chunking | embedding | upserting | done
+    progress_current = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    params = Column(Text, nullable=True)  # JSON options (reindex)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 class User(Base):
     __tablename__ = "users"
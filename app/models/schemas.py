@@ -1,17 +1,53 @@
 # app/models/schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, constr
+from typing import Optional, List, Literal
 
 class UploadResponse(BaseModel):
     message: str
     file_id: str
+    job_id: Optional[str] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str = "ingest"
+    doc_id: Optional[int] = None
+    status: str
+    stage: str
+    progress_current: int
+    progress_total: int
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+class ReindexRequest(BaseModel):
+    from_source: bool = False  # re-chunk the stored files (after changing chunk size/overlap)
+    profile: Optional[str] = None  # collection profile of the rebuilt collection (default COLLECTION_PROFILE)
+
+class DeleteResponse(BaseModel):
+    message: str
+    file_id: str
 
 class QueryRequest(BaseModel):
     query: str
+    # retrieval pipeline override for A/B timing; server default (QUERY_PIPELINE) when omitted
+    pipeline: Optional[Literal["serial", "speculative"]] = None
+    # set to false to bypass the semantic answer cache
+    use_cache: bool = True
+    # reranking override (off | llm | lexical); server default (RERANK_MODE) when omitted
+    rerank: Optional[Literal["off", "llm", "lexical"]] = None
+
+class BatchQueryRequest(BaseModel):
+    # blank queries are rejected: they would go into the one shared embedding call
+    queries: List[constr(strip_whitespace=True, min_length=1)]
+    # answers generated at once; server default (BATCH_QUERY_CONCURRENCY) when omitted
+    concurrency: Optional[int] = None
+    use_cache: bool = True
+    rerank: Optional[Literal["off", "llm", "lexical"]] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: Optional[List[str]] = None
+    timings: Optional[dict] = None
 
 # Authentication schemas
 class UserCreate(BaseModel):
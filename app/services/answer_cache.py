@@ -0,0 +1,181 @@
+# app/services/answer_cache.py
+# Semantic cache of generated answers: per tenant, keyed by query-embedding similarity and the tenant's document set.
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+from ..models import db as db_module
+from ..models import models
+from ..utils import metrics
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# minimum cosine similarity between query embeddings for a cached answer to be reused
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))  # per tenant
+# how long a tenant's document-set fingerprint is trusted before it is re-read from the database
+# (uploads/deletes in this process invalidate it immediately; this bounds staleness across workers)
+ANSWER_CACHE_FINGERPRINT_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_FINGERPRINT_TTL_SECONDS", "30"))
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    context_chunks: List[str]
+    cost_seconds: float  # time it took to produce the answer uncached
+    sources: List[dict] = field(default_factory=list)
+    # retrieval settings the answer was produced with (top_k, rerank mode, pipeline); only
+    # requests with the same settings may reuse it
+    settings: Tuple = ()
+    created: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+class _TenantCache:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()  # key -> (unit vector, CachedAnswer), least recently used first
+        self._matrix = None
+        self._keys = None
+        self._settings = None
+
+    def matrix(self):
+        # stacked unit vectors of all entries (and their settings), rebuilt only after the entry set changes
+        if self._matrix is None and self.entries:
+            self._keys = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[k][0] for k in self._keys])
+            self._settings = [self.entries[k][1].settings for k in self._keys]
+        return self._keys, self._matrix, self._settings
+
+    def changed(self):
+        self._matrix = None
+        self._keys = None
+        self._settings = None
+
+def document_set_fingerprint(db, owner: str = None) -> str:
+    """Hash of the owner's indexed documents (id + content hash); changes on every upload or delete."""
+    rows = (
+        db.query(models.Document.id, models.Document.content_hash)
+        .filter(models.Document.owner == owner, models.Document.status == "indexed")
+        .order_by(models.Document.id)
+        .all()
+    )
+    digest = hashlib.sha256()
+    for doc_id, content_hash in rows:
+        digest.update(f"{doc_id}:{content_hash or ''};".encode("utf-8"))
+    return digest.hexdigest()
+
+class AnswerCache:
+    def __init__(self, similarity: float, ttl_seconds: float, max_entries: int):
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tenants = {}
+        self._fingerprints = {}  # owner -> (fingerprint, read at)
+
+    def fingerprint(self, owner: str = None) -> str:
+        """Current document-set fingerprint of the owner (memoized; blocking DB read on refresh)."""
+        with self._lock:
+            memo = self._fingerprints.get(owner)
+        if memo is not None and time.monotonic() - memo[1] < ANSWER_CACHE_FINGERPRINT_TTL_SECONDS:
+            return memo[0]
+        db = db_module.SessionLocal()
+        try:
+            fingerprint = document_set_fingerprint(db, owner)
+        finally:
+            db.close()
+        with self._lock:
+            self._fingerprints[owner] = (fingerprint, time.monotonic())
+        return fingerprint
+
+    def lookup(self, owner: str, fingerprint: str, vector, settings: Tuple = ()) -> Optional[CachedAnswer]:
+        unit = _unit(vector)
+        with self._lock:
+            tenant = self._tenant(owner, fingerprint)
+            self._expire(tenant)
+            keys, matrix, entry_settings = tenant.matrix()
+            if matrix is None:
+                self._record(False)
+                return None
+            scores = matrix @ unit
+            # an answer produced with other retrieval settings is a miss, however similar the query
+            scores[[s != settings for s in entry_settings]] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                self._record(False)
+                return None
+            key = keys[best]
+            tenant.entries.move_to_end(key)
+            entry = tenant.entries[key][1]
+            entry.hits += 1
+            self._record(True)
+            return entry
+
+    def store(self, owner: str, fingerprint: str, vector, entry: CachedAnswer):
+        unit = _unit(vector)
+        with self._lock:
+            tenant = self._tenant(owner, fingerprint)
+            key = hashlib.sha256(unit.tobytes() + repr(entry.settings).encode("utf-8")).hexdigest()
+            tenant.entries[key] = (unit, entry)
+            while len(tenant.entries) > self.max_entries:
+                tenant.entries.popitem(last=False)
+                metrics.incr("answer_cache.evictions")
+            tenant.changed()
+            metrics.set_gauge("answer_cache.entries", sum(len(t.entries) for t in self._tenants.values()))
+
+    def invalidate_owner(self, owner: str = None):
+        """Drop the owner's cached answers (their document set changed)."""
+        with self._lock:
+            self._tenants.pop(owner, None)
+            self._fingerprints.pop(owner, None)
+        metrics.incr("answer_cache.invalidations")
+
+    def _tenant(self, owner: str, fingerprint: str) -> _TenantCache:
+        tenant = self._tenants.get(owner)
+        if tenant is None or tenant.fingerprint != fingerprint:
+            # answers computed against a different document set are never served
+            tenant = self._tenants[owner] = _TenantCache(fingerprint)
+        return tenant
+
+    def _expire(self, tenant: _TenantCache):
+        now = time.monotonic()
+        expired = [k for k, (_, entry) in tenant.entries.items() if now - entry.created > self.ttl_seconds]
+        for key in expired:
+            del tenant.entries[key]
+        if expired:
+            tenant.changed()
+            metrics.incr("answer_cache.expirations", len(expired))
+
+    def _record(self, hit: bool):
+        metrics.incr("answer_cache.hits" if hit else "answer_cache.misses")
+        hits = metrics.get_counter("answer_cache.hits")
+        total = hits + metrics.get_counter("answer_cache.misses")
+        metrics.set_gauge("answer_cache.hit_rate", round(hits / total, 4) if total else 0.0)
+
+def _unit(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache (None when disabled)."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache(ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES)
+        return _cache
+
+def invalidate_owner(owner: str = None):
+    """Called whenever the owner's document set changes (document indexed or deleted)."""
+    cache = get_answer_cache()
+    if cache is not None:
+        cache.invalidate_owner(owner)
@@ -0,0 +1,109 @@
+# app/services/bulk_writer.py
+import os
+import io
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from sqlalchemy.orm import Session
+from ..models import models
+from ..utils.vector_store import get_vector_store
+
+# points per Qdrant upsert request, and how many of those may be in flight at once
+QDRANT_UPSERT_BATCH = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_UPSERT_CONCURRENCY = int(os.getenv("QDRANT_UPSERT_CONCURRENCY", "2"))
+
+CHUNK_COLUMNS = ("doc_id", "text", "qdrant_point_id", "content_hash", "page", "char_start", "char_end")
+
+class BulkIndexWriter:
+    """
+    Writes chunk rows and vector points for one document in bulk.
+    Chunk rows go in with COPY on PostgreSQL (bulk_insert_mappings elsewhere).
+    Points are sent to Qdrant in QDRANT_UPSERT_BATCH-sized upserts with wait=False
+    on a background pool, so indexing overlaps with embedding the next batch;
+    close() acts as the consistency barrier.
+    """
+
+    def __init__(self, db: Session, collection: str, upsert_batch: int = None, concurrency: int = None):
+        self.db = db
+        self.collection = collection
+        self.upsert_batch = upsert_batch or QDRANT_UPSERT_BATCH
+        self.concurrency = concurrency or QDRANT_UPSERT_CONCURRENCY
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="qdrant-upsert")
+        self._in_flight = []
+        self._held_back = None  # last batch, sent with wait=True by close()
+        self._use_copy = db.bind is not None and db.bind.dialect.name == "postgresql"
+        self.sql_rows = 0
+        self.sql_seconds = 0.0
+        self.points = 0
+        self.qdrant_seconds = 0.0  # wall time from the first queued upsert to the barrier
+        self._qdrant_started = None
+
+    def write(self, rows: List[dict], points: List[dict]):
+        """Persist chunk rows (dicts keyed by CHUNK_COLUMNS) and queue their points for upsert."""
+        started = time.perf_counter()
+        if self._use_copy:
+            self._copy_rows(rows)
+        else:
+            self.db.bulk_insert_mappings(models.Chunk, rows)
+        self.db.commit()
+        self.sql_seconds += time.perf_counter() - started
+        self.sql_rows += len(rows)
+
+        for i in range(0, len(points), self.upsert_batch):
+            if self._held_back is not None:
+                self._submit(self._held_back)
+            self._held_back = points[i:i + self.upsert_batch]
+            if self._qdrant_started is None:
+                self._qdrant_started = time.perf_counter()
+
+    def _copy_rows(self, rows: List[dict]):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([row.get(col) for col in CHUNK_COLUMNS])
+        buf.seek(0)
+        # raw DBAPI connection of the session, so the COPY is part of its transaction
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY chunks ({', '.join(CHUNK_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+        finally:
+            cursor.close()
+
+    def _upsert(self, points: List[dict], wait: bool):
+        get_vector_store().upsert(self.collection, points, wait=wait)
+
+    def _submit(self, points: List[dict]):
+        # bound the number of outstanding requests; surface failures early
+        while len(self._in_flight) >= self.concurrency * 2:
+            self._collect(self._in_flight.pop(0))
+        self._in_flight.append((len(points), self._pool.submit(self._upsert, points, False)))
+
+    def _collect(self, entry):
+        count, future = entry
+        future.result()
+        self.points += count
+
+    def close(self):
+        """Wait for all queued upserts, then send the last batch with wait=True."""
+        try:
+            while self._in_flight:
+                self._collect(self._in_flight.pop(0))
+            if self._held_back:
+                # updates are applied in order per collection, so once this one is
+                # acknowledged as applied every earlier wait=False upsert is too
+                self._upsert(self._held_back, wait=True)
+                self.points += len(self._held_back)
+                self._held_back = None
+            if self._qdrant_started is not None:
+                self.qdrant_seconds = time.perf_counter() - self._qdrant_started
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "sql_rows": self.sql_rows,
+            "sql_rows_per_sec": round(self.sql_rows / self.sql_seconds, 1) if self.sql_seconds else 0.0,
+            "points": self.points,
+            "points_per_sec": round(self.points / self.qdrant_seconds, 1) if self.qdrant_seconds else 0.0,
+        }
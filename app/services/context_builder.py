@@ -0,0 +1,135 @@
+# app/services/context_builder.py
+# Packs retrieved chunks into the answer prompt: overlap merging, MMR diversity and a per-model token budget.
+import os
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List
+from ..utils import metrics
+from .lexical_index import tokenize
+
+# rough characters per token for Gemini models on English / legal text
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+# context tokens allowed in the answer prompt, per chat model (CONTEXT_TOKEN_BUDGET for anything else)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+MODEL_CONTEXT_BUDGETS: Dict[str, int] = {
+    "gemini-2.5-flash-lite": 2000,
+    "gemini-2.5-flash": 3000,
+    "gemini-2.5-pro": 6000,
+}
+# MMR trade-off: 1.0 = relevance only, 0.0 = diversity only
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+def budget_for_model(model: str) -> int:
+    name = (model or "").split("/")[-1]
+    return MODEL_CONTEXT_BUDGETS.get(name, CONTEXT_TOKEN_BUDGET)
+
+@dataclass
+class _Segment:
+    text: str
+    rank: int  # best retrieval rank among the merged chunks
+    doc_id: object = None
+    char_start: int = None
+    char_end: int = None
+    terms: set = field(default_factory=set)
+
+@dataclass
+class PackedContext:
+    chunks: List[str]
+    tokens: int  # estimated context tokens sent
+    tokens_in: int  # estimated tokens of the retrieved chunks as they came in
+    merged: int  # chunks folded into a neighbour
+    dropped: int  # segments left out by the budget
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens)
+
+def merge_overlapping(hits: List[dict]) -> List[_Segment]:
+    """
+    Fold chunks of the same document whose character ranges overlap or touch
+    into one segment. Chunk text is the slice [char_start, char_end) of the
+    whitespace-normalised document, so the overlap can be cut exactly.
+    """
+    positioned = {}
+    segments = []
+    for rank, hit in enumerate(hits):
+        start, end = hit.get("char_start"), hit.get("char_end")
+        if hit.get("doc_id") is None or start is None or end is None:
+            segments.append(_Segment(text=hit["text"], rank=rank))
+        else:
+            positioned.setdefault(hit["doc_id"], []).append((start, end, rank, hit["text"]))
+    for doc_id, spans in positioned.items():
+        spans.sort()
+        current = None
+        for start, end, rank, text in spans:
+            if current is not None and start <= current.char_end + 1:
+                if end > current.char_end:
+                    if start <= current.char_end:
+                        current.text += text[current.char_end - start:]
+                    else:
+                        current.text += " " + text  # adjacent: one collapsed space between them
+                    current.char_end = end
+                current.rank = min(current.rank, rank)
+                continue
+            current = _Segment(text=text, rank=rank, doc_id=doc_id, char_start=start, char_end=end)
+            segments.append(current)
+    for segment in segments:
+        segment.terms = set(tokenize(segment.text))
+    return segments
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def mmr_order(segments: List[_Segment], lambda_: float = None) -> List[_Segment]:
+    """
+    Maximal marginal relevance: relevance comes from retrieval rank, redundancy
+    from term overlap with the segments already selected.
+    """
+    lambda_ = CONTEXT_MMR_LAMBDA if lambda_ is None else lambda_
+    remaining = sorted(segments, key=lambda s: s.rank)
+    if not remaining:
+        return []
+    worst = max(s.rank for s in remaining) + 1
+    selected = []
+    while remaining:
+        def score(segment):
+            relevance = 1.0 - segment.rank / worst
+            redundancy = max((_similarity(segment.terms, s.terms) for s in selected), default=0.0)
+            return lambda_ * relevance - (1 - lambda_) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+def build_context(hits: List[dict], model: str, budget: int = None) -> PackedContext:
+    """Merge, diversify and pack hits into at most `budget` tokens (default: the model's budget)."""
+    budget = budget or budget_for_model(model)
+    separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+    tokens_in = sum(estimate_tokens(hit["text"]) for hit in hits) + separator_tokens * max(0, len(hits) - 1)
+    segments = merge_overlapping(hits)
+    merged = len(hits) - len(segments)
+
+    chunks = []
+    used = 0
+    dropped = 0
+    for segment in mmr_order(segments):
+        cost = estimate_tokens(segment.text) + (separator_tokens if chunks else 0)
+        if used + cost <= budget:
+            chunks.append(segment.text)
+            used += cost
+        elif not chunks:
+            # the most relevant segment alone is over budget: keep its head
+            chunks.append(segment.text[:int(budget * CHARS_PER_TOKEN)])
+            used = estimate_tokens(chunks[0])
+        else:
+            dropped += 1
+    packed = PackedContext(chunks=chunks, tokens=used, tokens_in=tokens_in, merged=merged, dropped=dropped)
+    metrics.incr("context.tokens_sent", packed.tokens)
+    metrics.incr("context.tokens_saved", packed.tokens_saved)
+    return packed
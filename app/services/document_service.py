@@ -1,45 +1,289 @@
 # app/services/document_service.py
 import os
+import hashlib
+import queue
+import time
+import threading
+from typing import Callable, Iterator, List, Optional
 from sqlalchemy.orm import Session
 from ..models import models
-from ..utils.chunker import simple_text_extractor, chunk_text
-from ..utils.embeddings_client import get_embedding
-from ..utils.qdrant_client import qdrant, ensure_collection
+from ..utils.chunker import TextChunk, iter_pages, iter_chunks
+from ..utils.embeddings_client import get_embeddings_batch
+from ..utils.vector_store import get_vector_store
+from ..utils import metrics
+from .bulk_writer import BulkIndexWriter
+from .answer_cache import invalidate_owner
+from . import lexical_index
+from ..utils.uploads import UPLOAD_BLOCK_SIZE
 import uuid
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+# chunks embedded + written per pipeline step while a document is still being extracted
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "128"))
 
-def save_uploaded_file(fileobj, filename: str, db: Session, owner: str = None):
+# per_user: one vector collection per tenant; shared: one collection for every tenant,
+# searched with a filter on the payload-indexed owner field
+COLLECTION_LAYOUT = os.getenv("COLLECTION_LAYOUT", "per_user")
+COLLECTION_LAYOUTS = ("per_user", "shared")
+SHARED_COLLECTION = os.getenv("SHARED_COLLECTION", "rag_shared")
+
+# progress(stage, current, total)
+ProgressCallback = Callable[[str, int, int], None]
+
+def tenant_id(owner: str = None) -> str:
+    # value stored in the "owner" payload field
+    return owner or "global"
+
+def tenant_collection(owner: str = None) -> str:
+    # per-tenant name: the vector collection in the per_user layout, the BM25 index in both layouts
+    return f"user_{tenant_id(owner)}"
+
+def is_shared_layout(layout: str = None) -> bool:
+    layout = layout or COLLECTION_LAYOUT
+    if layout not in COLLECTION_LAYOUTS:
+        raise ValueError(f"Unknown collection layout '{layout}'. Use one of {COLLECTION_LAYOUTS}")
+    return layout == "shared"
+
+def collection_for_owner(owner: str = None, layout: str = None) -> str:
+    # vector collection holding the owner's points
+    return SHARED_COLLECTION if is_shared_layout(layout) else tenant_collection(owner)
+
+def search_owner(owner: str = None, layout: str = None) -> Optional[str]:
+    # owner filter for vector searches (only needed when tenants share a collection)
+    return tenant_id(owner) if is_shared_layout(layout) else None
+
+def new_upload_path(filename: str) -> str:
+    """Return a unique path under UPLOAD_DIR for a new upload."""
     os.makedirs(UPLOAD_DIR, exist_ok=True)
-    unique_name = f"{uuid.uuid4().hex}_{filename}"
-    path = os.path.join(UPLOAD_DIR, unique_name)
-    with open(path, "wb") as f:
-        f.write(fileobj.read())
-    doc = models.Document(filename=filename, filepath=path, owner=owner)
+    unique_name = f"{uuid.uuid4().hex}_{os.path.basename(filename)}"
+    return os.path.join(UPLOAD_DIR, unique_name)
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def find_duplicate_document(db: Session, content_hash: str, owner: str = None):
+    """Return an existing (not failed) document of the same owner with identical content."""
+    if not content_hash:
+        return None
+    return (
+        db.query(models.Document)
+        .filter(
+            models.Document.owner == owner,
+            models.Document.content_hash == content_hash,
+            models.Document.status != "failed",
+        )
+        .order_by(models.Document.id)
+        .first()
+    )
+
+def register_document(filepath: str, filename: str, db: Session, owner: str = None, content_hash: str = None):
+    """Register an already stored file as a pending Document row."""
+    doc = models.Document(
+        filename=filename, filepath=filepath, owner=owner, status="pending", content_hash=content_hash
+    )
     db.add(doc)
     db.commit()
     db.refresh(doc)
-    # process doc -> chunks -> embeddings
-    text = simple_text_extractor(path)
-    chunks = chunk_text(text)
-    # prepare qdrant collection per user (or single collection)
-    collection = f"user_{owner or 'global'}"
-    # embed first chunk to get vector size
-    if len(chunks) == 0:
-        return doc, []
-    emb0 = get_embedding(chunks[0])
-    ensure_collection(collection, len(emb0))
-    points = []
-    chunk_objs = []
-    for i, chunk in enumerate(chunks):
-        emb = get_embedding(chunk)
-        point_id = str(uuid.uuid4())  # Generate UUID for point ID
-        points.append({"id": point_id, "vector": emb, "payload": {"doc_id": doc.id, "text": chunk}})
-        # store chunk metadata in local DB
-        c = models.Chunk(doc_id=doc.id, text=chunk, qdrant_point_id=point_id)
-        db.add(c)
-        chunk_objs.append(c)
+    return doc
+
+def store_uploaded_file(fileobj, filename: str, db: Session, owner: str = None):
+    """Copy a file-like object to disk in blocks and register a pending Document row."""
+    path = new_upload_path(filename)
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        while True:
+            block = fileobj.read(UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+    return register_document(path, filename, db, owner=owner, content_hash=digest.hexdigest())
+
+def find_reusable_vectors(db: Session, collection: str, chunk_hashes, owner: str = None, exclude_doc_id: int = None) -> dict:
+    """
+    Look up embeddings already indexed for identical chunk text of the same owner.
+    Returns {chunk_hash: vector} for every hash that could be reused.
+    """
+    chunk_hashes = list(set(chunk_hashes))
+    point_for_hash = {}
+    for i in range(0, len(chunk_hashes), 500):
+        rows = (
+            db.query(models.Chunk.content_hash, models.Chunk.qdrant_point_id)
+            .join(models.Document, models.Document.id == models.Chunk.doc_id)
+            .filter(
+                models.Document.owner == owner,
+                models.Document.status == "indexed",
+                models.Chunk.doc_id != exclude_doc_id,
+                models.Chunk.qdrant_point_id.isnot(None),
+                models.Chunk.content_hash.in_(chunk_hashes[i:i + 500]),
+            )
+            .all()
+        )
+        for chunk_hash, point_id in rows:
+            point_for_hash.setdefault(chunk_hash, point_id)
+    if not point_for_hash:
+        return {}
+    try:
+        vectors = get_vector_store().retrieve_vectors(collection, point_for_hash.values())
+    except Exception as e:
+        print(f"Could not reuse stored vectors from {collection}: {e}")
+        return {}
+    return {h: vectors[p] for h, p in point_for_hash.items() if p in vectors}
+
+def _prefetch_batches(chunks: Iterator[TextChunk], batch_size: int, depth: int = 2) -> Iterator[List[TextChunk]]:
+    """
+    Group chunks into batches produced by a background thread, so extraction
+    and chunking of later pages overlap with embedding of earlier ones.
+    At most `depth` batches are buffered, which keeps memory bounded.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    buffer.put(batch)
+                    batch = []
+            if batch:
+                buffer.put(batch)
+            buffer.put(done)
+        except BaseException as e:
+            buffer.put(e)
+
+    threading.Thread(target=produce, daemon=True, name="chunk-producer").start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def process_document(doc: models.Document, db: Session, progress: Optional[ProgressCallback] = None) -> int:
+    """
+    Extract, chunk, embed and index a stored document, streaming page by page.
+    Safe to re-run: chunks and points left by an interrupted run are replaced.
+    Returns the number of chunks indexed.
+    """
+    def report(stage: str, current: int = 0, total: int = 0):
+        if progress:
+            progress(stage, current, total)
+
+    collection = collection_for_owner(doc.owner)
+    lexical_name = tenant_collection(doc.owner)
+    # clear leftovers from a previous (interrupted) attempt
+    db.query(models.Chunk).filter(models.Chunk.doc_id == doc.id).delete()
     db.commit()
-    # upsert to qdrant
-    qdrant.upsert(collection_name=collection, points=points)
-    return doc, chunk_objs
+    get_vector_store().delete_doc_points(collection, doc.id)
+    lexical_index.remove_document(lexical_name, doc.id)
+
+    report("extracting")
+    chunk_stream = iter_chunks(iter_pages(doc.filepath, content_hash=doc.content_hash))
+    writer = None
+    seen = embedded = 0
+    wait_seconds = embed_seconds = 0.0
+    started = time.perf_counter()
+    try:
+        batches = _prefetch_batches(chunk_stream, INGEST_BATCH_CHUNKS)
+        while True:
+            waited = time.perf_counter()
+            batch = next(batches, None)
+            wait_seconds += time.perf_counter() - waited
+            if batch is None:
+                break
+            seen += len(batch)
+            # reuse embeddings of chunks already indexed for this owner; embed only new text
+            embed_started = time.perf_counter()
+            hashes = [hash_text(chunk.text) for chunk in batch]
+            known = find_reusable_vectors(db, collection, hashes, owner=doc.owner, exclude_doc_id=doc.id)
+            pending = {}
+            for chunk, h in zip(batch, hashes):
+                if h not in known and h not in pending:
+                    pending[h] = chunk.text
+            report("embedding", embedded, seen)
+            if pending:
+                # embed with batched, concurrent requests
+                new_vectors = get_embeddings_batch(
+                    list(pending.values()),
+                    on_progress=lambda done, total: report("embedding", embedded + done, seen),
+                )
+                known.update(zip(pending.keys(), new_vectors))
+            embed_seconds += time.perf_counter() - embed_started
+            embedded = seen
+            print(f"Doc {doc.id}: embedded {len(pending)} new chunks, reused {len(batch) - len(pending)} of {len(batch)}")
+            vectors = [known[h] for h in hashes]
+            if writer is None:
+                get_vector_store().ensure_collection(collection, len(vectors[0]), multitenant=is_shared_layout())
+                writer = BulkIndexWriter(db, collection)
+            report("upserting", seen - len(batch), seen)
+            rows = []
+            points = []
+            for chunk, emb, chunk_hash in zip(batch, vectors, hashes):
+                point_id = str(uuid.uuid4())  # Generate UUID for point ID
+                points.append({
+                    "id": point_id,
+                    "vector": emb,
+                    "payload": {
+                        "doc_id": doc.id,
+                        "owner": tenant_id(doc.owner),
+                        "text": chunk.text,
+                        "page": chunk.page,
+                        "char_start": chunk.char_start,
+                        "char_end": chunk.char_end,
+                    },
+                })
+                # chunk metadata for the local DB
+                rows.append({
+                    "doc_id": doc.id,
+                    "text": chunk.text,
+                    "qdrant_point_id": point_id,
+                    "content_hash": chunk_hash,
+                    "page": chunk.page,
+                    "char_start": chunk.char_start,
+                    "char_end": chunk.char_end,
+                })
+            # chunk rows are written now, points are upserted in the background
+            writer.write(rows, points)
+            lexical_index.index_points(lexical_name, points)
+    finally:
+        if writer is not None:
+            writer.close()
+    report("upserting", seen, seen)
+    doc.status = "indexed"
+    db.commit()
+    invalidate_owner(doc.owner)
+
+    total_seconds = time.perf_counter() - started
+    stats = writer.stats() if writer is not None else {}
+    metrics.incr("ingest.chunks", seen)
+    metrics.observe("ingest.document", total_seconds)
+    print(
+        f"Doc {doc.id} indexed: {seen} chunks in {total_seconds:.2f}s | "
+        f"extract+chunk wait {wait_seconds:.2f}s | "
+        f"embed {embed_seconds:.2f}s ({seen / embed_seconds if embed_seconds else 0:.1f} chunks/sec) | "
+        f"sql {stats.get('sql_rows_per_sec', 0)} rows/sec | qdrant {stats.get('points_per_sec', 0)} points/sec"
+    )
+    return seen
+
+def delete_document(doc: models.Document, db: Session):
+    """Remove a document: its vectors, lexical postings, chunk rows, jobs, stored file and the row itself."""
+    owner = doc.owner
+    get_vector_store().delete_doc_points(collection_for_owner(owner), doc.id)
+    lexical_index.remove_document(tenant_collection(owner), doc.id)
+    db.query(models.Chunk).filter(models.Chunk.doc_id == doc.id).delete(synchronize_session=False)
+    db.query(models.IngestionJob).filter(models.IngestionJob.doc_id == doc.id).delete(synchronize_session=False)
+    filepath = doc.filepath
+    db.delete(doc)
+    db.commit()
+    if filepath and os.path.exists(filepath):
+        os.remove(filepath)
+    invalidate_owner(owner)
+
+def save_uploaded_file(fileobj, filename: str, db: Session, owner: str = None):
+    # synchronous store + index in one call (scripts / tests); the API uses the job queue
+    doc = store_uploaded_file(fileobj, filename, db, owner=owner)
+    chunk_count = process_document(doc, db)
+    return doc, chunk_count
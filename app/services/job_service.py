@@ -0,0 +1,137 @@
+# app/services/job_service.py
+import os
+import json
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from ..models import db as db_module
+from ..models import models
+from .document_service import process_document
+from .reindex_service import reindex_owner
+
+# how many documents may be ingested at the same time (per process)
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+# a job interrupted more than this many times is marked failed instead of resumed
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="ingest")
+_in_flight = set()
+_lock = threading.Lock()
+
+def create_ingestion_job(db: Session, doc: models.Document) -> models.IngestionJob:
+    """Create a queued ingestion job for a stored document."""
+    job = models.IngestionJob(id=uuid.uuid4().hex, doc_id=doc.id, owner=doc.owner)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def create_reindex_job(db: Session, owner: str = None, from_source: bool = False,
+                       profile: str = None) -> models.IngestionJob:
+    """Create a queued job that rebuilds the owner's collection."""
+    job = models.IngestionJob(
+        id=uuid.uuid4().hex, kind="reindex", owner=owner,
+        params=json.dumps({"from_source": from_source, "profile": profile}),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: str):
+    """Get a job by id."""
+    return db.query(models.IngestionJob).filter(models.IngestionJob.id == job_id).first()
+
+def latest_job_for_document(db: Session, doc_id: int):
+    """Get the most recent ingestion job of a document."""
+    return (
+        db.query(models.IngestionJob)
+        .filter(models.IngestionJob.doc_id == doc_id)
+        .order_by(models.IngestionJob.created_at.desc())
+        .first()
+    )
+
+def enqueue_job(job_id: str):
+    """Hand a job to the worker pool (ignored if it is already queued in this process)."""
+    with _lock:
+        if job_id in _in_flight:
+            return
+        _in_flight.add(job_id)
+    _executor.submit(_run_job, job_id)
+
+def _run_job(job_id: str):
+    db = db_module.SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None or job.status == "completed":
+            return
+        doc = None
+        if job.kind != "reindex":
+            doc = db.query(models.Document).filter(models.Document.id == job.doc_id).first()
+            if doc is None:
+                job.status, job.error = "failed", "Document no longer exists"
+                db.commit()
+                return
+
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.error = None
+        db.commit()
+
+        def progress(stage: str, current: int = 0, total: int = 0):
+            job.stage = stage
+            job.progress_current = current
+            job.progress_total = total
+            db.commit()
+
+        if job.kind == "reindex":
+            params = json.loads(job.params or "{}")
+            reindex_owner(
+                db, owner=job.owner, from_source=params.get("from_source", False),
+                profile=params.get("profile"), progress=progress,
+            )
+        else:
+            process_document(doc, db, progress=progress)
+        job.status, job.stage = "completed", "done"
+        db.commit()
+    except Exception as e:
+        traceback.print_exc()
+        db.rollback()
+        job = get_job(db, job_id)
+        if job is not None:
+            job.status, job.error = "failed", str(e)
+            doc = db.query(models.Document).filter(models.Document.id == job.doc_id).first() if job.doc_id else None
+            if doc is not None:
+                doc.status = "failed"
+            db.commit()
+    finally:
+        db.close()
+        with _lock:
+            _in_flight.discard(job_id)
+
+def resume_pending_jobs():
+    """Re-queue jobs that were queued or running when the process last stopped."""
+    db = db_module.SessionLocal()
+    try:
+        pending = (
+            db.query(models.IngestionJob)
+            .filter(models.IngestionJob.status.in_(("queued", "running")))
+            .order_by(models.IngestionJob.created_at)
+            .all()
+        )
+        resumable = []
+        for job in pending:
+            if (job.attempts or 0) >= MAX_JOB_ATTEMPTS:
+                job.status, job.error = "failed", "Gave up after repeated interruptions"
+                continue
+            job.status = "queued"
+            resumable.append(job.id)
+        db.commit()
+        for job_id in resumable:
+            enqueue_job(job_id)
+        if resumable:
+            print(f"Resumed {len(resumable)} pending ingestion job(s)")
+    finally:
+        db.close()
@@ -0,0 +1,295 @@
+# app/services/lexical_index.py
+# Incremental BM25 inverted index over chunk text, one SQLite file per collection.
+import os
+import re
+import math
+import zlib
+import heapq
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from typing import Dict, List
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from ..models import db as db_module
+from ..models import models
+from ..utils import metrics
+
+load_dotenv()
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "./lexical_index")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# reciprocal rank fusion constant, shared by hybrid retrieval and the lexical reranker
+RRF_K = 60
+# query terms found in more than this fraction of chunks are ignored (unless no other term matches)
+LEXICAL_MAX_DF_RATIO = float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.5"))
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "what which who whom when where why how do does did shall should may can".split()
+)
+# words (with internal / - . : separators kept, e.g. cr/ccps/593/2025, 12.03.2025, 66a)
+_TOKEN = re.compile(r"[a-z0-9]+(?:[/\-.:][a-z0-9]+)*")
+# "Section 66", "sec. 66A", "u/s 302", "Article 21", "Order VII Rule 11" -> "section:66", ...
+_PROVISION = re.compile(
+    r"\b(section|sec|s|u/s|article|art|rule|order|clause)\s*\.?\s*(\d+[a-z]*|[ivxlc]+\b)", re.I
+)
+_PROVISION_KIND = {"sec": "section", "s": "section", "u/s": "section", "art": "article"}
+
+def bm25_idf(df: int, n: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+def bm25_term_score(tf: int, idf: float, length: int, avg_length: float) -> float:
+    """Contribution of one query term to a chunk's BM25 score."""
+    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+    return idf * tf * (BM25_K1 + 1) / norm
+
+def rrf_score(rank: int) -> float:
+    # reciprocal rank fusion credit of a 0-based rank
+    return 1.0 / (RRF_K + rank + 1)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms for indexing and querying. Identifiers are kept whole
+    (and also split into their parts), and statutory references are emitted
+    as one "kind:number" term so "Section 66" does not just match "66".
+    """
+    text = text.lower()
+    terms = []
+    for token in _TOKEN.findall(text):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[/\-.:]", token) if part and part not in _STOPWORDS)
+    for kind, number in _PROVISION.findall(text):
+        terms.append(f"{_PROVISION_KIND.get(kind, kind)}:{number}")
+    return terms
+
+class LexicalIndex:
+    """
+    BM25 over (point_id -> chunk) entries. Postings are clustered by term
+    (WITHOUT ROWID), chunk text is stored zlib-compressed so hits carry the
+    same payload as vector hits, and collection statistics live in `meta`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = self._open(path)
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "point_id TEXT PRIMARY KEY, doc_id INTEGER, length INTEGER NOT NULL, "
+            "page INTEGER, char_start INTEGER, char_end INTEGER, text BLOB NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_chunks_doc_id ON chunks (doc_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, point_id TEXT NOT NULL, tf INTEGER NOT NULL, length INTEGER NOT NULL, "
+            "PRIMARY KEY (term, point_id)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('chunks', 0), ('total_length', 0)")
+        conn.commit()
+        return conn
+
+    def add(self, entries: List[dict]):
+        """Index entries with keys id, text and optionally doc_id, page, char_start, char_end."""
+        if not entries:
+            return
+        with self._lock:
+            self._remove_points([str(e["id"]) for e in entries])
+            chunk_rows = []
+            posting_rows = []
+            total_length = 0
+            for e in entries:
+                counts = Counter(tokenize(e["text"]))
+                length = sum(counts.values())
+                total_length += length
+                point_id = str(e["id"])
+                chunk_rows.append((
+                    point_id, e.get("doc_id"), length, e.get("page"), e.get("char_start"), e.get("char_end"),
+                    zlib.compress(e["text"].encode("utf-8")),
+                ))
+                posting_rows.extend((term, point_id, tf, length) for term, tf in counts.items())
+            self._conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)", chunk_rows)
+            self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", posting_rows)
+            self._bump(len(chunk_rows), total_length)
+            self._conn.commit()
+
+    def remove_document(self, doc_id: int):
+        with self._lock:
+            point_ids = [row[0] for row in self._conn.execute("SELECT point_id FROM chunks WHERE doc_id = ?", (doc_id,))]
+            self._remove_points(point_ids)
+            self._conn.commit()
+
+    def _remove_points(self, point_ids: List[str]):
+        # postings are keyed by term, so the terms are recovered from the stored text
+        for start in range(0, len(point_ids), 500):
+            part = point_ids[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT point_id, length, text FROM chunks WHERE point_id IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            if not rows:
+                continue
+            postings = []
+            for point_id, _, blob in rows:
+                postings.extend((term, point_id) for term in set(tokenize(zlib.decompress(blob).decode("utf-8"))))
+            self._conn.executemany("DELETE FROM postings WHERE term = ? AND point_id = ?", postings)
+            self._conn.executemany("DELETE FROM chunks WHERE point_id = ?", [(row[0],) for row in rows])
+            self._bump(-len(rows), -sum(row[1] for row in rows))
+
+    def _bump(self, chunks: int, total_length: int):
+        self._conn.execute("UPDATE meta SET value = value + ? WHERE name = 'chunks'", (chunks,))
+        self._conn.execute("UPDATE meta SET value = value + ? WHERE name = 'total_length'", (total_length,))
+
+    def search(self, query: str, top_k: int = 5) -> List[dict]:
+        """Return up to top_k hits ({"id", "score", "doc_id", "text", ...}) by BM25 score."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+            n = meta.get("chunks", 0)
+            if n <= 0:
+                return []
+            avg_length = max(meta.get("total_length", 0) / n, 1.0)
+            dfs = {}
+            for term in terms:
+                df = self._conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                if df:
+                    dfs[term] = df
+            # near-ubiquitous terms add almost nothing to BM25 but cost a full postings scan
+            rare = {term: df for term, df in dfs.items() if df <= n * LEXICAL_MAX_DF_RATIO}
+            scores = {}
+            for term, df in (rare or dfs).items():
+                idf = bm25_idf(df, n)
+                postings = self._conn.execute("SELECT point_id, tf, length FROM postings WHERE term = ?", (term,))
+                for point_id, tf, length in postings:
+                    scores[point_id] = scores.get(point_id, 0.0) + bm25_term_score(tf, idf, length, avg_length)
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            if not best:
+                return []
+            ids = [point_id for point_id, _ in best]
+            rows = {
+                row[0]: row
+                for row in self._conn.execute(
+                    f"SELECT point_id, doc_id, page, char_start, char_end, text FROM chunks "
+                    f"WHERE point_id IN ({','.join('?' * len(ids))})", ids
+                )
+            }
+        hits = []
+        for point_id, score in best:
+            _, doc_id, page, char_start, char_end, blob = rows[point_id]
+            hits.append({
+                "id": point_id,
+                "score": score,
+                "doc_id": doc_id,
+                "text": zlib.decompress(blob).decode("utf-8"),
+                "page": page,
+                "char_start": char_start,
+                "char_end": char_end,
+            })
+        return hits
+
+    def replace_with(self, built_path: str):
+        """Atomically swap in an index file built elsewhere (see rebuild_owner)."""
+        with self._lock:
+            self._conn.close()
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            os.replace(built_path, self.path)
+            self._conn = self._open(self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT name, value FROM meta"))
+        return {"chunks": meta.get("chunks", 0), "bytes": os.path.getsize(self.path)}
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+def index_path(collection: str) -> str:
+    return os.path.join(LEXICAL_INDEX_DIR, f"{collection}.sqlite3")
+
+def get_lexical_index(collection: str):
+    """Return the process-wide index of a collection (None when disabled)."""
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    with _indexes_lock:
+        index = _indexes.get(collection)
+        if index is None:
+            index = _indexes[collection] = LexicalIndex(index_path(collection))
+        return index
+
+def index_points(collection: str, points: List[dict]):
+    """Index Qdrant-style points ({"id", "payload": {...}}) as they are written."""
+    index = get_lexical_index(collection)
+    if index is not None:
+        index.add([{"id": p["id"], **p["payload"]} for p in points])
+        metrics.incr("lexical_index.chunks_added", len(points))
+
+def remove_document(collection: str, doc_id: int):
+    index = get_lexical_index(collection)
+    if index is not None:
+        index.remove_document(doc_id)
+
+def rebuild_owner(db: Session, collection: str, owner: str = None, batch_size: int = 1000) -> int:
+    """Rebuild a collection's index from the owner's indexed Chunk rows; returns the chunk count."""
+    if not LEXICAL_INDEX_ENABLED:
+        return 0
+    built_path = f"{index_path(collection)}.rebuild"
+    if os.path.exists(built_path):
+        os.remove(built_path)
+    building = LexicalIndex(built_path)
+    doc_ids = [
+        doc_id for (doc_id,) in db.query(models.Document.id)
+        .filter(models.Document.owner == owner, models.Document.status == "indexed")
+    ]
+    count = 0
+    last_id = 0
+    while doc_ids:
+        rows = (
+            db.query(models.Chunk)
+            .filter(models.Chunk.doc_id.in_(doc_ids), models.Chunk.id > last_id, models.Chunk.qdrant_point_id.isnot(None))
+            .order_by(models.Chunk.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        building.add([
+            {"id": row.qdrant_point_id, "doc_id": row.doc_id, "text": row.text,
+             "page": row.page, "char_start": row.char_start, "char_end": row.char_end}
+            for row in rows
+        ])
+        count += len(rows)
+    building._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    building._conn.close()
+    get_lexical_index(collection).replace_with(built_path)
+    return count
+
+if __name__ == "__main__":
+    # python -m app.services.lexical_index --owner mvp_user   (backfill / rebuild from the chunks table)
+    from .document_service import tenant_collection
+    parser = argparse.ArgumentParser(description="Rebuild a tenant's BM25 index from stored chunks")
+    parser.add_argument("--owner", default=None)
+    args = parser.parse_args()
+    session = db_module.SessionLocal()
+    try:
+        name = tenant_collection(args.owner)
+        total = rebuild_owner(session, name, owner=args.owner)
+        print(f"Rebuilt lexical index for {name}: {total} chunks, {get_lexical_index(name).stats()['bytes']} bytes")
+    finally:
+        session.close()
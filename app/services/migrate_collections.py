@@ -0,0 +1,98 @@
+# app/services/migrate_collections.py
+# Move vectors between the per-user and the shared collection layouts (see COLLECTION_LAYOUT).
+import argparse
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from ..models import db as db_module
+from ..models import models
+from ..utils.vector_store import get_vector_store, versioned_name
+from .document_service import SHARED_COLLECTION, tenant_collection, tenant_id
+
+MIGRATE_BATCH_POINTS = 256
+
+def _owners(db: Session) -> List[Optional[str]]:
+    # every tenant with documents (None is the "global" tenant)
+    return [owner for (owner,) in db.query(models.Document.owner).distinct()]
+
+def _exists(store, name: str) -> bool:
+    return store.resolve_alias(name) is not None or store.collection_exists(name)
+
+def _drop(store, name: str):
+    # every physical version behind a logical name (its aliases go with them)
+    for physical in {store.resolve_alias(name), name, *(versioned_name(name, v) for v in store.list_versions(name))}:
+        if physical and store.collection_exists(physical):
+            store.delete_collection(physical)
+
+def _copy(store, source: str, target: str, owner: Optional[str], multitenant: bool, source_owner: str = None) -> int:
+    copied = 0
+    for batch in store.iter_points(source, MIGRATE_BATCH_POINTS, owner=source_owner):
+        for point in batch:
+            point["payload"]["owner"] = tenant_id(owner)
+        if copied == 0:
+            store.ensure_collection(target, len(batch[0]["vector"]), multitenant=multitenant)
+        store.upsert(target, batch, wait=True)
+        copied += len(batch)
+    return copied
+
+def migrate_to_shared(db: Session, owners: List[Optional[str]] = None, drop_source: bool = False) -> dict:
+    """
+    Copy each tenant's per-user collection into the shared collection, tagging
+    points with their owner. Point ids are kept, so chunk rows stay valid and the
+    copy can be re-run. Returns {tenant: points copied}.
+    """
+    store = get_vector_store()
+    migrated = {}
+    for owner in owners if owners is not None else _owners(db):
+        source = tenant_collection(owner)
+        if not _exists(store, source):
+            continue
+        expected = store.count_points(source)
+        copied = _copy(store, source, SHARED_COLLECTION, owner, multitenant=True)
+        found = store.count_points(SHARED_COLLECTION, owner=tenant_id(owner)) if copied else 0
+        if copied != expected or found < expected:
+            raise RuntimeError(f"{source}: {expected} points, copied {copied}, {found} found in {SHARED_COLLECTION}")
+        migrated[tenant_id(owner)] = copied
+        print(f"{source} -> {SHARED_COLLECTION}: {copied} points")
+        if drop_source:
+            _drop(store, source)
+    return migrated
+
+def migrate_to_per_user(db: Session, owners: List[Optional[str]] = None, drop_source: bool = False) -> dict:
+    """Split the shared collection back into one collection per tenant. Returns {tenant: points copied}."""
+    store = get_vector_store()
+    if drop_source and owners is not None:
+        raise ValueError("--drop-source needs every tenant to be migrated (omit --owner)")
+    if not _exists(store, SHARED_COLLECTION):
+        return {}
+    migrated = {}
+    for owner in owners if owners is not None else _owners(db):
+        target = tenant_collection(owner)
+        expected = store.count_points(SHARED_COLLECTION, owner=tenant_id(owner))
+        copied = _copy(store, SHARED_COLLECTION, target, owner, multitenant=False, source_owner=tenant_id(owner))
+        if copied != expected or (copied and store.count_points(target) < expected):
+            raise RuntimeError(f"{tenant_id(owner)}: {expected} points in {SHARED_COLLECTION}, {copied} copied to {target}")
+        migrated[tenant_id(owner)] = copied
+        print(f"{SHARED_COLLECTION} -> {target}: {copied} points")
+    if drop_source:
+        remaining = store.count_points(SHARED_COLLECTION) - sum(migrated.values())
+        if remaining:
+            raise RuntimeError(f"{remaining} points in {SHARED_COLLECTION} belong to no known tenant; not dropped")
+        _drop(store, SHARED_COLLECTION)
+    return migrated
+
+if __name__ == "__main__":
+    # python -m app.services.migrate_collections --to shared [--owner mvp_user ...] [--drop-source]
+    # then restart the API with COLLECTION_LAYOUT set to the new layout
+    parser = argparse.ArgumentParser(description="Migrate vectors between per-user and shared collections")
+    parser.add_argument("--to", choices=("shared", "per_user"), required=True)
+    parser.add_argument("--owner", action="append", default=None, help="tenant to migrate (repeatable; default all)")
+    parser.add_argument("--drop-source", action="store_true", help="delete the source collections once verified")
+    args = parser.parse_args()
+    selected = None if args.owner is None else [None if o == "global" else o for o in args.owner]
+    session = db_module.SessionLocal()
+    try:
+        migrate = migrate_to_shared if args.to == "shared" else migrate_to_per_user
+        result = migrate(session, owners=selected, drop_source=args.drop_source)
+        print(f"Migrated {len(result)} tenants, {sum(result.values())} points. Set COLLECTION_LAYOUT={args.to}")
+    finally:
+        session.close()
@@ -1,19 +1,23 @@
 # app/services/rag_service.py
-from qdrant_client import QdrantClient
 from sqlalchemy.orm import Session
-from ..utils.embeddings_client import get_embedding
-from ..utils.qdrant_client import qdrant
+from ..utils.embeddings_client import get_embedding, get_embedding_async, get_embeddings_batch
+from ..utils.vector_store import get_vector_store
 import os
-import google.generativeai as genai
+import re
+import time
+import asyncio
+import contextlib
 from dotenv import load_dotenv
-from ..utils.LLMmodel import get_LLM_Response
+from ..utils.LLMmodel import get_LLM_Response, stream_LLM_Response
+from ..utils import metrics
+from .answer_cache import get_answer_cache, CachedAnswer
+from .lexical_index import get_lexical_index, rrf_score
+from .rerank_service import rerank_hits, candidate_count, RERANK_MODE
+from .context_builder import build_context, CONTEXT_SEPARATOR
+from .document_service import collection_for_owner, search_owner, tenant_collection
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINIAI_API_KEY")
 CHAT_MODEL = os.getenv("MODEL_FOR_CHAT", "models/gemini-2.5-flash")
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-
 
 
 enhancedQueryPrompt = f"""you're a helpful assistant, you're a part of an advanced RAG pipeline and your job is to
@@ -39,101 +43,354 @@ Special instructions:
 - Include relevant keywords and concepts that would likely appear in legal, business, or other document types
 - Make the hypothetical answer detailed enough to help retrieve relevant chunks from the database"""
 
-evaluator_prompt = """You are a chunk relevance evaluator.
-your task is to evaluate each retrieved chunk, whether the chunk is relevant to the user query or not.
-strictly reply in just "yes" or "no"
-and be very strict during the evaluation,
-Example:
-Query: What is ReactJS, its features, use cases, and benefits in web development?
-Here are 3 retrieved chunks.
-
-[
-  Document {
-    pageContent: 'Version 1.0 \n' +
-      "const name = 'Andrew' \n" +
-      'const userAge = 27 \n' +
-      '... JavaScript object shorthand example ...',
-    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
-    id: '0f430e4b-2c63-494d-a3d7-ad59e3d8bf96'
-  },
-  Document {
-    pageContent: 'Version 1.0 \n' +
-      '<!DOCTYPE html> \n' +
-      '... Express Handlebars templating example ...',
-    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
-    id: '879441b8-8518-4b38-b001-4a1a9ed6880a'
-  },
-  Document {
-    pageContent: 'Version 1.0 \n' +
-      '... Lesson about Node.js basics ...',
-    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
-    id: '6f6ed719-7323-47af-9e87-aa4463bb1761'
-  }
-]
-
-Output JSON:
-{
-  "0": "no",
-  "1": "no",
-  "2": "no"
-}
-            
-reason: bcz these chunks are about nodejs and never talked about reactjs"""
-
-
-
+# vector: Qdrant only; hybrid: Qdrant + BM25 lexical index fused by reciprocal rank
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
 
+def merge_hits(result_lists, top_k: int):
+    """Reciprocal rank fusion of several hit lists, deduplicated by point id."""
+    scores = {}
+    best = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits):
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + rrf_score(rank)
+            best.setdefault(hit["id"], hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [best[point_id] for point_id in ranked[:top_k]]
 
 def retrieve_relevant_chunks(query: str, top_k: int = 5, owner: str = None):
     vector = get_embedding(query)
-    collection = f"user_{owner or 'global'}"
     # search
-    res = qdrant.search(collection_name=collection, query_vector=vector, limit=top_k)
-    chunks = []
+    res = get_vector_store().search(collection_for_owner(owner), vector, limit=top_k, owner=search_owner(owner))
+    hits = []
     for hit in res:
         payload = hit.payload or {}
-        text = payload.get("text")
-        if text:
-            chunks.append(text)
+        if payload.get("text"):
+            hits.append({"id": str(hit.id), "score": hit.score, **payload})
+    index = get_lexical_index(tenant_collection(owner)) if RETRIEVAL_MODE == "hybrid" else None
+    if index is not None:
+        hits = merge_hits([hits, index.search(query, top_k=top_k)], top_k)
+    chunks = [hit["text"] for hit in hits]
     print(chunks)
     return chunks
 
-async def answer_query(query: str, top_k: int = 5, owner: str = None):
+async def vector_search_async(query: str, top_k: int = 5, owner: str = None):
+    """Embed the query and search the owner's collection without blocking the event loop."""
+    vector = await get_embedding_async(query)
+    res = await get_vector_store().search_async(
+        collection_for_owner(owner), vector, limit=top_k, owner=search_owner(owner)
+    )
+    hits = []
+    for hit in res:
+        payload = hit.payload or {}
+        if payload.get("text"):
+            hits.append({"id": str(hit.id), "score": hit.score, **payload})
+    return hits
 
-    queryLLM = "gemini-2.5-flash-lite";
-    enhanced_query = await get_LLM_Response(queryLLM, enhancedQueryPrompt, query)
+async def search_chunks_async(query: str, top_k: int = 5, owner: str = None, mode: str = None):
+    """
+    Retrieve the top_k chunks for a query. In hybrid mode the vector search and
+    the BM25 lookup run concurrently and are merged with reciprocal rank fusion,
+    so exact identifiers (section / case numbers, names) are not lost.
+    """
+    mode = mode or RETRIEVAL_MODE
+    index = get_lexical_index(tenant_collection(owner)) if mode == "hybrid" else None
+    if index is None:
+        return await vector_search_async(query, top_k=top_k, owner=owner)
+    candidates = top_k * 2
+    started = time.perf_counter()
+    vector_hits, lexical_hits = await asyncio.gather(
+        vector_search_async(query, top_k=candidates, owner=owner),
+        asyncio.to_thread(index.search, query, candidates),
+    )
+    metrics.observe("retrieval.hybrid", time.perf_counter() - started)
+    return merge_hits([vector_hits, lexical_hits], top_k)
 
-    print(enhanced_query)
+async def retrieve_relevant_chunks_async(query: str, top_k: int = 5, owner: str = None):
+    hits = await search_chunks_async(query, top_k=top_k, owner=owner)
+    return [hit["text"] for hit in hits]
 
-    # hyde_query = await get_LLM_Response(queryLLM, HyDe_Prompt, query)
+QUERY_LLM = "gemini-2.5-flash-lite"
+# serial: enhance, then retrieve; speculative: retrieve on the raw query while the enhancement runs
+QUERY_PIPELINE = os.getenv("QUERY_PIPELINE", "speculative")
+PIPELINES = ("serial", "speculative")
+# queries at least this long are treated as specific enough to skip enhancement (speculative mode)
+ENHANCE_SKIP_MIN_WORDS = int(os.getenv("ENHANCE_SKIP_MIN_WORDS", "14"))
 
-    # print(hyde_query)
+_VAGUE_REFERENCE = re.compile(r"\b(this|the|that)\s+(pdf|document|doc|file|case|judgment|order)\b", re.I)
+_IDENTIFIER = re.compile(r"\d|/|\bsection\b|\bv\.?\s|\bvs\.?\s", re.I)
 
-    new_prompt = f" {enhanced_query} "
+def should_skip_enhancement(query: str) -> bool:
+    """A query that is long, or names identifiers (sections, case numbers, parties), is already specific."""
+    words = query.split()
+    if _VAGUE_REFERENCE.search(query):
+        return False
+    if len(words) >= ENHANCE_SKIP_MIN_WORDS:
+        return True
+    return len(words) >= 5 and bool(_IDENTIFIER.search(query))
 
-    
-    chunks = retrieve_relevant_chunks(new_prompt, top_k=top_k, owner=owner)
-    # build a simple prompt
-    context = "\n\n---\n\n".join(chunks)
-    prompt = f"""You are a helpful assistant that answers questions based on the provided information. Use the information below to answer the user's question comprehensively and accurately.
+async def enhance_query(query: str) -> str:
+    # a rewritten query is short; low temperature keeps it close to the user's intent
+    enhanced_query = await get_LLM_Response(QUERY_LLM, enhancedQueryPrompt, query, max_output_tokens=256, temperature=0.2)
+    print(enhanced_query)
+    return enhanced_query
 
-INFORMATION:
-{context}
+async def retrieve_for_query(query: str, top_k: int = 5, owner: str = None, pipeline: str = None):
+    """
+    Run query enhancement + retrieval with the selected pipeline.
+    Returns (hits, timings) where timings are in milliseconds.
+    """
+    pipeline = pipeline or QUERY_PIPELINE
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{pipeline}'. Use one of {PIPELINES}")
+    started = time.perf_counter()
+    timings = {"pipeline": pipeline}
 
-QUESTION:
-{query}
+    if pipeline == "serial":
+        enhanced_query = await enhance_query(query)
+        timings["enhance_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        hits = await search_chunks_async(f" {enhanced_query} ", top_k=top_k, owner=owner)
+    elif should_skip_enhancement(query):
+        timings["enhance_skipped"] = True
+        hits = await search_chunks_async(query, top_k=top_k, owner=owner)
+    else:
+        # speculative: embed + search the raw query while the enhancement call is in flight
+        raw_search = asyncio.create_task(search_chunks_async(query, top_k=top_k, owner=owner))
+        try:
+            try:
+                enhanced_query = await enhance_query(query)
+            except Exception as e:
+                print(f"Query enhancement failed, using raw query results: {e}")
+                enhanced_query = None
+            timings["enhance_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            result_lists = []
+            if enhanced_query:
+                try:
+                    result_lists.append(await search_chunks_async(f" {enhanced_query} ", top_k=top_k, owner=owner))
+                except Exception as e:
+                    print(f"Enhanced query search failed, using raw query results: {e}")
+            result_lists.append(await raw_search)
+        finally:
+            # the caller was cancelled or failed before the raw search was awaited
+            if not raw_search.done():
+                raw_search.cancel()
+        hits = merge_hits(result_lists, top_k)
+
+    timings["retrieval_ready_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics.observe(f"query.{pipeline}.retrieval_ready", timings["retrieval_ready_ms"] / 1000)
+    return hits, timings
+
+# static part of the answer prompt, sent as the model's system instruction
+ANSWER_SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided information. Use the INFORMATION in the user message to answer its QUESTION comprehensively and accurately.
 
 INSTRUCTIONS:
-- Answer the question based ONLY on the information provided above
+- Answer the question based ONLY on the information provided
 - If the information contains relevant details about the topic, use them to provide a complete answer
 - Do not say the information doesn't contain details about the topic if relevant content is clearly present
 - Be specific and detailed in your response
 - If the user asks about "this PDF" or "this document", refer to the content as if it's the document they're asking about
 """
-    # model = genai.GenerativeModel(CHAT_MODEL)
-    response = await get_LLM_Response(CHAT_MODEL, prompt, query)
-    
-    
-    return {"answer": response, "context_chunks": chunks}
-    return {response}
 
+def build_answer_prompt(query: str, chunks) -> str:
+    # per-query part of the answer prompt: retrieved context and the question
+    context = CONTEXT_SEPARATOR.join(chunks)
+    return f"""INFORMATION:
+{context}
+
+QUESTION:
+{query}
+"""
+
+def answer_settings(top_k: int, rerank: str, pipeline: str) -> tuple:
+    # request settings that change the answer; part of the answer cache key
+    return (top_k, rerank or RERANK_MODE, pipeline)
+
+def _sources(hits):
+    return [
+        {"id": hit["id"], "doc_id": hit.get("doc_id"), "page": hit.get("page"), "score": hit.get("score")}
+        for hit in hits
+    ]
+
+async def _prepare_answer(query: str, top_k: int, owner: str, pipeline: str, use_cache: bool, rerank: str) -> dict:
+    """
+    Everything before generation: cache lookup, retrieval, reranking and
+    context packing. Returns a state dict; state["cached"] is set on a cache hit.
+    """
+    pipeline = pipeline or QUERY_PIPELINE
+    state = {"started": time.perf_counter(), "cache": None, "cached": None,
+             "settings": answer_settings(top_k, rerank, pipeline)}
+    cache = get_answer_cache() if use_cache else None
+    if cache is not None:
+        # the query embedding is cached, so retrieval below reuses it on a miss
+        state["vector"] = await get_embedding_async(query)
+        state["fingerprint"] = await asyncio.to_thread(cache.fingerprint, owner)
+        state["cache"] = cache
+        cached = cache.lookup(owner, state["fingerprint"], state["vector"], state["settings"])
+        if cached is not None:
+            elapsed = time.perf_counter() - state["started"]
+            metrics.incr("answer_cache.saved_seconds", max(0.0, cached.cost_seconds - elapsed))
+            metrics.observe("query.cached.total", elapsed)
+            state["cached"] = cached
+            state["timings"] = {"pipeline": "cache", "total_ms": round(elapsed * 1000, 1)}
+            return state
+
+    hits, timings = await retrieve_for_query(query, top_k=candidate_count(top_k, rerank), owner=owner, pipeline=pipeline)
+    await _pack_hits(state, query, hits, top_k, rerank, timings)
+    return state
+
+async def _pack_hits(state: dict, query: str, hits, top_k: int, rerank: str, timings: dict):
+    hits, rerank_info = await rerank_hits(query, hits, top_k, mode=rerank)
+    timings.update(rerank_info)
+    # merge overlapping chunks, diversify and fit the chat model's context budget
+    context = build_context(hits, CHAT_MODEL)
+    timings.update({"context_tokens": context.tokens, "tokens_saved": context.tokens_saved})
+    state.update(
+        chunks=context.chunks,
+        sources=_sources(hits),
+        prompt=build_answer_prompt(query, context.chunks),
+        timings=timings,
+    )
+
+def _finish_answer(state: dict, query: str, owner: str, response: str, generation_started: float):
+    timings = state["timings"]
+    timings["generation_ms"] = round((time.perf_counter() - generation_started) * 1000, 1)
+    total_seconds = time.perf_counter() - state["started"]
+    timings["total_ms"] = round(total_seconds * 1000, 1)
+    metrics.observe(f"query.{timings['pipeline']}.total", total_seconds)
+    if state["cache"] is not None and state["chunks"] and response:
+        state["cache"].store(
+            owner, state["fingerprint"], state["vector"],
+            CachedAnswer(query, response, state["chunks"], total_seconds, sources=state["sources"],
+                         settings=state["settings"]),
+        )
+
+async def answer_query(query: str, top_k: int = 5, owner: str = None, pipeline: str = None,
+                       use_cache: bool = True, rerank: str = None):
+    state = await _prepare_answer(query, top_k, owner, pipeline, use_cache, rerank)
+    cached = state["cached"]
+    if cached is not None:
+        return {"answer": cached.answer, "context_chunks": cached.context_chunks, "timings": state["timings"]}
+    generation_started = time.perf_counter()
+    response = await get_LLM_Response(CHAT_MODEL, ANSWER_SYSTEM_PROMPT, state["prompt"])
+    _finish_answer(state, query, owner, response, generation_started)
+    return {"answer": response, "context_chunks": state["chunks"], "timings": state["timings"]}
+
+async def stream_answer(query: str, top_k: int = 5, owner: str = None, pipeline: str = None,
+                        use_cache: bool = True, rerank: str = None):
+    """
+    Async generator of (event, data) pairs: one "sources" event once retrieval
+    is done, "token" events as the answer is generated, then "done" with the
+    timings. Closing it early cancels the upstream generation.
+    """
+    state = await _prepare_answer(query, top_k, owner, pipeline, use_cache, rerank)
+    cached = state["cached"]
+    if cached is not None:
+        yield "sources", {"sources": cached.sources}
+        yield "token", {"text": cached.answer}
+        yield "done", {"timings": state["timings"]}
+        return
+
+    yield "sources", {"sources": state["sources"]}
+    generation_started = time.perf_counter()
+    pieces = []
+    completed = False
+    try:
+        # aclosing: if we are closed mid-stream, the upstream generator is closed (and cancelled) right away
+        async with contextlib.aclosing(stream_LLM_Response(CHAT_MODEL, ANSWER_SYSTEM_PROMPT, state["prompt"])) as tokens:
+            async for text in tokens:
+                if not pieces:
+                    ttft = time.perf_counter() - state["started"]
+                    state["timings"]["ttft_ms"] = round(ttft * 1000, 1)
+                    metrics.observe("query.stream.ttft", ttft)
+                pieces.append(text)
+                yield "token", {"text": text}
+        completed = True
+    finally:
+        if not completed:
+            metrics.incr("query.stream.cancelled")
+    _finish_answer(state, query, owner, "".join(pieces), generation_started)
+    yield "done", {"timings": state["timings"]}
+
+# answers generated at the same time for one batch request
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+
+async def _search_batch(queries, top_k: int, owner: str):
+    """Embed every query in one batched call and search them with one batched request."""
+    vectors = await asyncio.to_thread(get_embeddings_batch, queries)
+    results = await get_vector_store().search_batch_async(
+        collection_for_owner(owner), vectors, limit=top_k, owner=search_owner(owner)
+    )
+    hit_lists = [
+        [{"id": str(hit.id), "score": hit.score, **(hit.payload or {})} for hit in result if (hit.payload or {}).get("text")]
+        for result in results
+    ]
+    index = get_lexical_index(tenant_collection(owner)) if RETRIEVAL_MODE == "hybrid" else None
+    if index is not None:
+        lexical = await asyncio.gather(*(asyncio.to_thread(index.search, q, top_k) for q in queries))
+        hit_lists = [merge_hits([hits, extra], top_k) for hits, extra in zip(hit_lists, lexical)]
+    return vectors, hit_lists
+
+async def answer_batch(queries, top_k: int = 5, owner: str = None, concurrency: int = None,
+                       use_cache: bool = True, rerank: str = None):
+    """
+    Answer many queries against one tenant. Embedding and search are shared
+    batched calls (no per-query enhancement); answers are generated with at
+    most `concurrency` in flight. Yields one result dict per query as soon as
+    it finishes, in completion order; a failing item carries "error" instead
+    of failing the batch.
+    """
+    started = time.perf_counter()
+    candidates = candidate_count(top_k, rerank)
+    # a blank query would fail (or pollute) the shared embedding call for every other item
+    valid = [index for index, query in enumerate(queries) if query and query.strip()]
+    for index, query in enumerate(queries):
+        if not (query and query.strip()):
+            yield {"index": index, "query": query, "error": "Empty query"}
+    if not valid:
+        return
+    try:
+        found_vectors, found_hits = await _search_batch([queries[i] for i in valid], candidates, owner)
+    except Exception as e:
+        for index in valid:
+            yield {"index": index, "query": queries[index], "error": f"Retrieval failed: {e}"}
+        return
+    vectors = dict(zip(valid, found_vectors))
+    hit_lists = dict(zip(valid, found_hits))
+    retrieval_ms = round((time.perf_counter() - started) * 1000, 1)
+    metrics.observe("query.batch.retrieval", retrieval_ms / 1000)
+
+    cache = get_answer_cache() if use_cache else None
+    fingerprint = await asyncio.to_thread(cache.fingerprint, owner) if cache is not None else None
+    settings = answer_settings(top_k, rerank, "batch")
+    semaphore = asyncio.Semaphore(concurrency or BATCH_QUERY_CONCURRENCY)
+
+    async def one(index: int):
+        query = queries[index]
+        try:
+            if cache is not None:
+                cached = cache.lookup(owner, fingerprint, vectors[index], settings)
+                if cached is not None:
+                    return {"index": index, "query": query, "answer": cached.answer,
+                            "sources": cached.sources, "timings": {"pipeline": "cache"}}
+            async with semaphore:
+                state = {"started": time.perf_counter(), "cache": cache, "fingerprint": fingerprint,
+                         "vector": vectors[index], "settings": settings}
+                await _pack_hits(state, query, hit_lists[index], top_k, rerank,
+                                 {"pipeline": "batch", "retrieval_ready_ms": retrieval_ms})
+                generation_started = time.perf_counter()
+                response = await get_LLM_Response(CHAT_MODEL, ANSWER_SYSTEM_PROMPT, state["prompt"])
+            _finish_answer(state, query, owner, response, generation_started)
+            return {"index": index, "query": query, "answer": response,
+                    "sources": state["sources"], "timings": state["timings"]}
+        except Exception as e:
+            metrics.incr("query.batch.failed")
+            return {"index": index, "query": query, "error": str(e)}
+
+    tasks = [asyncio.create_task(one(i)) for i in valid]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # consumer went away (or finished): stop whatever is still generating
+        for task in tasks:
+            task.cancel()
+    metrics.observe("query.batch.total", time.perf_counter() - started)
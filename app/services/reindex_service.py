@@ -0,0 +1,228 @@
+# app/services/reindex_service.py
+# Rebuild a tenant's vectors into a new versioned collection, then swap the alias atomically.
+# In the shared layout the one collection holds every tenant, so the whole of it is rebuilt.
+import os
+import time
+import uuid
+import argparse
+from typing import List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..models import db as db_module
+from ..models import models
+from ..utils.chunker import iter_pages, iter_chunks
+from ..utils.embeddings_client import get_embeddings_batch
+from ..utils.vector_store import get_vector_store, versioned_name
+from .document_service import (
+    collection_for_owner, hash_text, is_shared_layout, tenant_collection, tenant_id, ProgressCallback
+)
+from .answer_cache import invalidate_owner
+from .lexical_index import rebuild_owner as rebuild_lexical_index
+
+# chunks embedded per step, and the pause between steps so a rebuild does not starve live traffic
+REINDEX_BATCH_CHUNKS = int(os.getenv("REINDEX_BATCH_CHUNKS", "128"))
+REINDEX_THROTTLE_SECONDS = float(os.getenv("REINDEX_THROTTLE_SECONDS", "0.5"))
+# keep the previous collection version after the swap (for rollback)
+REINDEX_KEEP_OLD = os.getenv("REINDEX_KEEP_OLD", "false").lower() in ("1", "true", "yes")
+
+class _Rebuild:
+    """Embeds (point_id, text, payload) entries into the new collection in throttled batches."""
+
+    def __init__(self, collection: str, progress: Optional[ProgressCallback], total: int, multitenant: bool = False,
+                 profile: str = None):
+        self.collection = collection
+        self.multitenant = multitenant
+        self.profile = profile
+        self.progress = progress
+        self.total = total
+        self.done = 0
+        self.created = False
+
+    def write(self, entries: List[tuple]):
+        if not entries:
+            return
+        vectors = get_embeddings_batch([text for _, text, _ in entries])
+        if not self.created:
+            get_vector_store().create_physical_collection(
+                self.collection, len(vectors[0]), multitenant=self.multitenant, profile=self.profile
+            )
+            self.created = True
+        points = [
+            {"id": point_id, "vector": vector, "payload": payload}
+            for (point_id, _, payload), vector in zip(entries, vectors)
+        ]
+        get_vector_store().upsert(self.collection, points, wait=True)
+        self.done += len(entries)
+        if self.progress:
+            self.progress("reindexing", self.done, max(self.total, self.done))
+        time.sleep(REINDEX_THROTTLE_SECONDS)
+
+def _payload(chunk, owner: str = None) -> dict:
+    return {
+        "doc_id": chunk.doc_id,
+        "owner": tenant_id(owner),
+        "text": chunk.text,
+        "page": chunk.page,
+        "char_start": chunk.char_start,
+        "char_end": chunk.char_end,
+    }
+
+def _copy_stored_chunks(db: Session, rebuild: _Rebuild, doc_ids: List[int]):
+    # re-embed stored chunk rows, keeping their point ids
+    last_id = 0
+    while doc_ids:
+        rows = (
+            db.query(models.Chunk, models.Document.owner)
+            .join(models.Document, models.Document.id == models.Chunk.doc_id)
+            .filter(models.Chunk.doc_id.in_(doc_ids), models.Chunk.id > last_id)
+            .order_by(models.Chunk.id)
+            .limit(REINDEX_BATCH_CHUNKS)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0].id
+        rebuild.write([
+            (row.qdrant_point_id, row.text, _payload(row, owner)) for row, owner in rows if row.qdrant_point_id
+        ])
+
+def _rechunk_from_source(db: Session, rebuild: _Rebuild, doc: models.Document) -> List[int]:
+    """Re-chunk a document from its stored file; returns the ids of the chunk rows it replaces."""
+    old_ids = [row.id for row in db.query(models.Chunk.id).filter(models.Chunk.doc_id == doc.id)]
+    batch = []
+
+    def flush():
+        rows = []
+        entries = []
+        for chunk in batch:
+            point_id = str(uuid.uuid4())
+            row = {
+                "doc_id": doc.id,
+                "text": chunk.text,
+                "qdrant_point_id": point_id,
+                "content_hash": hash_text(chunk.text),
+                "page": chunk.page,
+                "char_start": chunk.char_start,
+                "char_end": chunk.char_end,
+            }
+            rows.append(row)
+            payload = {k: row[k] for k in ("doc_id", "text", "page", "char_start", "char_end")}
+            payload["owner"] = tenant_id(doc.owner)
+            entries.append((point_id, chunk.text, payload))
+        rebuild.write(entries)
+        db.bulk_insert_mappings(models.Chunk, rows)
+        db.commit()
+        batch.clear()
+
+    for chunk in iter_chunks(iter_pages(doc.filepath, content_hash=doc.content_hash)):
+        batch.append(chunk)
+        if len(batch) >= REINDEX_BATCH_CHUNKS:
+            flush()
+    if batch:
+        flush()
+    return old_ids
+
+def reindex_owner(db: Session, owner: str = None, from_source: bool = False,
+                  progress: Optional[ProgressCallback] = None, profile: str = None) -> str:
+    """
+    Rebuild the owner's collection into a new version and swap the alias onto it.
+    In the shared layout every tenant's documents are rebuilt (they share the collection).
+    Args:
+        owner (str, optional): Tenant whose collection is rebuilt.
+        from_source (bool): Re-chunk the stored files (needed after changing chunk
+            size/overlap) instead of re-embedding the stored Chunk rows.
+        progress (callable, optional): Called with ("reindexing", done, total).
+        profile (str, optional): Collection profile (quantization / HNSW settings) of the
+            new version; this is how existing collections move to another profile.
+    Returns:
+        str: Name of the new physical collection.
+    """
+    store = get_vector_store()
+    shared = is_shared_layout()
+    alias = collection_for_owner(owner)
+    previous = store.resolve_alias(alias)
+    versions = store.list_versions(alias)
+    new_collection = versioned_name(alias, (versions[-1] if versions else 0) + 1)
+
+    def tenant_documents(query):
+        return query if shared else query.filter(models.Document.owner == owner)
+
+    docs = (
+        tenant_documents(db.query(models.Document))
+        .filter(models.Document.status == "indexed")
+        .order_by(models.Document.id)
+        .all()
+    )
+    processed = {doc.id for doc in docs}
+    total = db.query(models.Chunk).filter(models.Chunk.doc_id.in_(processed)).count() if processed else 0
+    rebuild = _Rebuild(new_collection, progress, total, multitenant=shared, profile=profile)
+    print(f"Reindexing {alias}: {len(docs)} documents, ~{total} chunks -> {new_collection}")
+
+    def catch_up():
+        # documents indexed through the alias while the rebuild was running
+        query = tenant_documents(db.query(models.Document.id))
+        if processed:
+            query = query.filter(models.Document.id.notin_(processed))
+        _copy_stored_chunks(db, rebuild, [doc_id for (doc_id,) in query])
+
+    replaced_chunk_ids = []
+    # chunk rows written by a from-source rebuild get ids above this
+    last_chunk_id = db.query(func.max(models.Chunk.id)).scalar() or 0
+    try:
+        if from_source:
+            for doc in docs:
+                replaced_chunk_ids.extend(_rechunk_from_source(db, rebuild, doc))
+        else:
+            _copy_stored_chunks(db, rebuild, list(processed))
+        catch_up()
+        if not rebuild.created:
+            print(f"Nothing to reindex for {alias}")
+            return previous or alias
+        store.swap_alias(alias, new_collection)
+    except BaseException:
+        # failed or interrupted before the swap: the live version is untouched, drop the partial one
+        db.rollback()
+        if rebuild.created and store.resolve_alias(alias) != new_collection:
+            print(f"Reindex of {alias} failed, removing partial collection {new_collection}")
+            try:
+                store.delete_collection(new_collection)
+                if from_source and processed:
+                    db.query(models.Chunk).filter(
+                        models.Chunk.doc_id.in_(processed), models.Chunk.id > last_chunk_id
+                    ).delete(synchronize_session=False)
+                    db.commit()
+            except Exception as e:
+                print(f"Could not clean up after the failed reindex of {alias}: {e}")
+        raise
+    # uploads still mid-flight during the swap may have written to the old version
+    catch_up()
+
+    if replaced_chunk_ids:
+        for i in range(0, len(replaced_chunk_ids), 500):
+            db.query(models.Chunk).filter(
+                models.Chunk.id.in_(replaced_chunk_ids[i:i + 500])
+            ).delete(synchronize_session=False)
+        db.commit()
+    if from_source:
+        # same documents, different chunks (new point ids): rebuild the BM25 index and
+        # drop cached answers that may cite text that no longer exists
+        for tenant in sorted({doc.owner for doc in docs}, key=lambda o: o or "") if shared else [owner]:
+            rebuild_lexical_index(db, tenant_collection(tenant), owner=tenant)
+            invalidate_owner(tenant)
+    if previous and previous != new_collection and not REINDEX_KEEP_OLD:
+        store.delete_collection(previous)
+    print(f"Reindexed {alias}: alias now points to {new_collection} ({rebuild.done} chunks)")
+    return new_collection
+
+if __name__ == "__main__":
+    # python -m app.services.reindex_service --owner mvp_user [--from-source] [--profile compact]
+    parser = argparse.ArgumentParser(description="Rebuild a tenant's vector collection with zero downtime")
+    parser.add_argument("--owner", default=None)
+    parser.add_argument("--from-source", action="store_true", help="re-chunk stored files instead of stored chunks")
+    parser.add_argument("--profile", default=None, help="collection profile of the new version")
+    args = parser.parse_args()
+    session = db_module.SessionLocal()
+    try:
+        reindex_owner(session, owner=args.owner, from_source=args.from_source, profile=args.profile)
+    finally:
+        session.close()
@@ -0,0 +1,149 @@
+# app/services/rerank_service.py
+# Optional reranking of over-fetched candidates: one batched LLM relevance call, or a local lexical scorer.
+import os
+import re
+import json
+import time
+import asyncio
+from collections import Counter
+from typing import List, Tuple
+from ..utils.LLMmodel import get_LLM_Response
+from ..utils import metrics
+from .lexical_index import bm25_idf, bm25_term_score, rrf_score, tokenize
+
+# off | llm | lexical
+RERANK_MODE = os.getenv("RERANK_MODE", "off")
+RERANK_MODES = ("off", "llm", "lexical")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "gemini-2.5-flash-lite")
+# candidates fetched per final chunk when reranking
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))
+# reranking slower than this falls back to retrieval order
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "1500"))
+# characters of each candidate shown to the evaluator
+RERANK_CHUNK_CHARS = int(os.getenv("RERANK_CHUNK_CHARS", "800"))
+
+evaluator_prompt = """You are a chunk relevance evaluator.
+your task is to evaluate each retrieved chunk, whether the chunk is relevant to the user query or not.
+strictly reply in just "yes" or "no"
+and be very strict during the evaluation,
+Example:
+Query: What is ReactJS, its features, use cases, and benefits in web development?
+Here are 3 retrieved chunks.
+
+[
+  Document {
+    pageContent: 'Version 1.0 \n' +
+      "const name = 'Andrew' \n" +
+      'const userAge = 27 \n' +
+      '... JavaScript object shorthand example ...',
+    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
+    id: '0f430e4b-2c63-494d-a3d7-ad59e3d8bf96'
+  },
+  Document {
+    pageContent: 'Version 1.0 \n' +
+      '<!DOCTYPE html> \n' +
+      '... Express Handlebars templating example ...',
+    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
+    id: '879441b8-8518-4b38-b001-4a1a9ed6880a'
+  },
+  Document {
+    pageContent: 'Version 1.0 \n' +
+      '... Lesson about Node.js basics ...',
+    metadata: { source: 'src/nodejs.pdf', pdf: [Object], loc: [Object] },
+    id: '6f6ed719-7323-47af-9e87-aa4463bb1761'
+  }
+]
+
+Output JSON:
+{
+  "0": "no",
+  "1": "no",
+  "2": "no"
+}
+            
+reason: bcz these chunks are about nodejs and never talked about reactjs"""
+
+def candidate_count(top_k: int, mode: str = None) -> int:
+    """How many chunks to retrieve so the reranker has something to choose from."""
+    return top_k * RERANK_OVERFETCH if (mode or RERANK_MODE) != "off" else top_k
+
+def _evaluator_message(query: str, hits: List[dict]) -> str:
+    lines = [f"Query: {query}", f"Here are {len(hits)} retrieved chunks.", ""]
+    for i, hit in enumerate(hits):
+        lines.append(f"[{i}]\n{hit['text'][:RERANK_CHUNK_CHARS]}\n")
+    lines.append('Output JSON mapping every chunk index to "yes" or "no", e.g. {"0": "yes", "1": "no"}')
+    return "\n".join(lines)
+
+def _parse_verdicts(response: str) -> dict:
+    match = re.search(r"\{.*\}", response or "", re.S)
+    if not match:
+        raise ValueError(f"Evaluator returned no JSON: {response[:200] if response else response}")
+    return {int(k): str(v).strip().lower() == "yes" for k, v in json.loads(match.group(0)).items()}
+
+async def _rerank_llm(query: str, hits: List[dict], top_k: int) -> List[dict]:
+    # every candidate is judged in a single call
+    response = await get_LLM_Response(RERANK_MODEL, evaluator_prompt, _evaluator_message(query, hits), temperature=0.0)
+    verdicts = _parse_verdicts(response)
+    relevant = [hit for i, hit in enumerate(hits) if verdicts.get(i)]
+    metrics.incr("rerank.llm.dropped", len(hits) - len(relevant))
+    # nothing judged relevant: keep retrieval order rather than send an empty context
+    return relevant[:top_k] if relevant else hits[:top_k]
+
+def rerank_lexical(query: str, hits: List[dict], top_k: int) -> List[dict]:
+    """
+    BM25 of the query over the candidate set, fused with retrieval order by
+    reciprocal rank so lexical matches move up without discarding semantic ones.
+    """
+    terms = set(tokenize(query))
+    docs = [Counter(tokenize(hit["text"])) for hit in hits]
+    if not terms or not docs:
+        return hits[:top_k]
+    avg_length = max(sum(sum(d.values()) for d in docs) / len(docs), 1.0)
+    df = {term: sum(1 for d in docs if term in d) for term in terms}
+    lexical = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for term in terms:
+            tf = d.get(term, 0)
+            if tf:
+                score += bm25_term_score(tf, bm25_idf(df[term], len(docs)), length, avg_length)
+        lexical.append(score)
+    lexical_rank = {i: rank for rank, i in enumerate(sorted(range(len(hits)), key=lambda i: -lexical[i]))}
+    # candidates without any query term get no lexical credit
+    fused = sorted(
+        range(len(hits)),
+        key=lambda i: -(rrf_score(i) + (rrf_score(lexical_rank[i]) if lexical[i] > 0 else 0.0)),
+    )
+    return [hits[i] for i in fused[:top_k]]
+
+async def rerank_hits(query: str, hits: List[dict], top_k: int, mode: str = None) -> Tuple[List[dict], dict]:
+    """
+    Reduce over-fetched candidates to top_k. Returns (hits, info) where info
+    records the mode used, the elapsed milliseconds and whether the latency
+    budget forced a fallback to retrieval order.
+    """
+    mode = mode or RERANK_MODE
+    if mode not in RERANK_MODES:
+        raise ValueError(f"Unknown rerank mode '{mode}'. Use one of {RERANK_MODES}")
+    if mode == "off" or len(hits) <= 1:
+        return hits[:top_k], {"rerank": "off"}
+    started = time.perf_counter()
+    info = {"rerank": mode}
+    try:
+        if mode == "llm":
+            ranked = await asyncio.wait_for(_rerank_llm(query, hits, top_k), timeout=RERANK_BUDGET_MS / 1000)
+        else:
+            ranked = rerank_lexical(query, hits, top_k)
+    except asyncio.TimeoutError:
+        metrics.incr("rerank.budget_exceeded")
+        ranked, info["fallback"] = hits[:top_k], "budget"
+    except Exception as e:
+        print(f"Reranking failed, keeping retrieval order: {e}")
+        metrics.incr("rerank.errors")
+        ranked, info["fallback"] = hits[:top_k], "error"
+    elapsed = time.perf_counter() - started
+    metrics.observe(f"rerank.{mode}", elapsed)
+    info["rerank_ms"] = round(elapsed * 1000, 1)
+    info["candidates"] = len(hits)
+    return ranked, info
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import tempfile
 import json
+from ..utils.uploads import save_upload_to_tempfile, remove_file
 from .service import summarize_pdf, extract_events_and_dates, legal_guide, find_similar_cases
 
 router = APIRouter()
@@ -12,27 +12,33 @@ class LegalQueryRequest(BaseModel):
 
 @router.post("/summarize-pdf")
 async def summarize_pdf_endpoint(file: UploadFile = File(...)):
+    stored = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp_path = tmp.name
-        summary = await summarize_pdf(tmp_path)
-        return {"summary": summary}
+        stored = await save_upload_to_tempfile(file, suffix=".pdf")
+        summary, timings = await summarize_pdf(stored.path, content_hash=stored.sha256)
+        return {"summary": summary, "timings": timings}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if stored:
+            remove_file(stored.path)
 
 @router.post("/extract-events-dates")
 async def extract_events_and_dates_endpoint(file: UploadFile = File(...)):
+    stored = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp_path = tmp.name
-        events = await extract_events_and_dates(tmp_path)
-        return {"events": events}
+        stored = await save_upload_to_tempfile(file, suffix=".pdf")
+        events, timings = await extract_events_and_dates(stored.path, content_hash=stored.sha256)
+        return {"events": events, "timings": timings}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if stored:
+            remove_file(stored.path)
 
 @router.post("/legal-guide")
 async def legal_guide_endpoint(request: LegalQueryRequest):
@@ -65,21 +71,14 @@ async def similar_cases_endpoint(
                     detail="Only PDF files are supported"
                 )
             
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                contents = await file.read()
-                tmp.write(contents)
-                tmp_path = tmp.name
-            
-            # Find similar cases using PDF
-            result = await find_similar_cases(pdf_path=tmp_path)
-            
-            # Clean up temporary file
-            import os
+            # Stream uploaded file to a temporary file
+            stored = await save_upload_to_tempfile(file, suffix=".pdf")
             try:
-                os.unlink(tmp_path)
-            except:
-                pass
+                # Find similar cases using PDF
+                result = await find_similar_cases(pdf_path=stored.path, content_hash=stored.sha256)
+            finally:
+                # Clean up temporary file
+                remove_file(stored.path)
                 
         elif query:
             # Handle form data query
@@ -0,0 +1,132 @@
+# app/tools/map_reduce.py
+# Map-reduce over long documents: token-bounded sections processed concurrently, then merged.
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Tuple
+from ..services.context_builder import estimate_tokens, CHARS_PER_TOKEN
+from ..utils import metrics
+
+# documents above this many (estimated) tokens are processed section by section
+MAP_REDUCE_MIN_TOKENS = int(os.getenv("MAP_REDUCE_MIN_TOKENS", "16000"))
+# upper bound of one section sent to a map call
+MAP_REDUCE_SECTION_TOKENS = int(os.getenv("MAP_REDUCE_SECTION_TOKENS", "6000"))
+# map calls in flight per document (the LLM scheduler still caps the process-wide total)
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+
+@dataclass
+class Section:
+    text: str
+    first_page: int
+    last_page: int
+
+    @property
+    def label(self) -> str:
+        if self.first_page == self.last_page:
+            return f"page {self.first_page}"
+        return f"pages {self.first_page}-{self.last_page}"
+
+def split_sections(pages: List[str], max_tokens: int = None) -> List[Section]:
+    """
+    Group consecutive pages into sections of at most max_tokens; a page that is
+    larger on its own is cut at paragraph (or, failing that, character) boundaries.
+    """
+    max_tokens = max_tokens or MAP_REDUCE_SECTION_TOKENS
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    sections = []
+    parts, size, first, last = [], 0, None, None
+
+    def flush():
+        nonlocal parts, size, first
+        if parts:
+            sections.append(Section("\n".join(parts), first, last))
+        parts, size, first = [], 0, None
+
+    for number, page in enumerate(pages, start=1):
+        page = page.strip()
+        if not page:
+            continue
+        for piece in _cut(page, max_chars):
+            if size and size + len(piece) + 1 > max_chars:
+                flush()
+            if first is None:
+                first = number
+            parts.append(piece)
+            size += len(piece) + 1
+            last = number
+    flush()
+    return sections
+
+def _cut(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+def needs_map_reduce(pages: List[str]) -> bool:
+    return sum(estimate_tokens(page) for page in pages) > MAP_REDUCE_MIN_TOKENS
+
+async def map_reduce(
+    sections: List[Section],
+    map_call: Callable[[Section], Awaitable[str]],
+    reduce_call: Callable[[List[str]], Awaitable[str]],
+    name: str,
+    concurrency: int = None,
+) -> Tuple[str, dict]:
+    """
+    Run map_call on every section concurrently, then reduce_call on the partial
+    results (in document order). Partials too large for one reduce prompt are
+    first collapsed in groups. Returns (result, timings in ms).
+    """
+    semaphore = asyncio.Semaphore(concurrency or MAP_REDUCE_CONCURRENCY)
+
+    async def bounded(call, arg):
+        async with semaphore:
+            return await call(arg)
+
+    timings = {"mode": "map_reduce", "sections": len(sections)}
+    started = time.perf_counter()
+    partials = await asyncio.gather(*(bounded(map_call, section) for section in sections))
+    timings["map_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics.observe(f"{name}.map", time.perf_counter() - started)
+
+    started = time.perf_counter()
+    rounds = 0
+    while len(partials) > 1 and sum(estimate_tokens(p) for p in partials) > MAP_REDUCE_SECTION_TOKENS * 2:
+        groups = _group(partials, MAP_REDUCE_SECTION_TOKENS * 2)
+        if len(groups) == len(partials):
+            break  # every partial is already as large as a group; reduce them as they are
+        partials = await asyncio.gather(*(bounded(reduce_call, group) for group in groups))
+        rounds += 1
+    if rounds:
+        timings["collapse_rounds"] = rounds
+        timings["collapse_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        started = time.perf_counter()
+    result = await reduce_call(list(partials))
+    timings["reduce_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics.observe(f"{name}.reduce", time.perf_counter() - started)
+    return result, timings
+
+def _group(texts: List[str], max_tokens: int) -> List[List[str]]:
+    groups, current, size = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+    if current:
+        groups.append(current)
+    return groups
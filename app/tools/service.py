@@ -121,68 +121,130 @@ SYSTEM_PROMPT_EXTRACT_EVENTS_DATES = (
    
 )
 
-import fitz  # PyMuPDF
 import re
+import time
 import asyncio
 import requests
 import json
 import os
-from langchain_community.document_loaders import PyPDFLoader
 from ..utils.LLMmodel import get_LLM_Response
+from ..utils.pdf_extract import extract_pdf_pages_async
+from .map_reduce import map_reduce, needs_map_reduce, split_sections
 
-async def summarize_pdf(pdf_path):
+# model for the per-section (map) calls of long documents; the merge uses gemini-2.5-flash
+MAP_MODEL = os.getenv("MAP_REDUCE_MAP_MODEL", "gemini-2.5-flash-lite")
+
+# output format of the events / timeline tool (single call, map and reduce prompts)
+EVENTS_FORMAT_INSTRUCTIONS = """IMPORTANT: Return ONLY a formatted timeline text, NOT JSON. Use this exact format:
+    
+    Case Timeline
+    
+    July 10, 2025, 18:00 IST – July 11, 2025, 02:00 IST – Unauthorized access and data exfiltration from the company server; traced to the accused's IP address.
+    
+    July 15, 2025, 11:30 IST – FIR filed by Mr. Ankit Sharma, CTO of Innovatech Solutions, at the Cyber Crime Police Station, Bengaluru.
+    
+    August 03, 2025, 07:15 IST – Accused arrested from his residence; laptop, hard drives, and mobile phone seized for forensic analysis.
+    
+    Do NOT return JSON format. Do NOT use asterisks (*) or any markdown formatting. Return only the formatted timeline text as shown above using plain text."""
+
+async def _load_pages(pdf_path, content_hash: str, timings: dict):
+    started = time.perf_counter()
+    pages = await extract_pdf_pages_async(pdf_path, content_hash=content_hash)
+    timings["extract_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return pages
+
+async def _single_call(system_prompt: str, prompt: str, timings: dict, temperature: float = None) -> str:
+    timings["mode"] = "single"
+    started = time.perf_counter()
+    result = await get_LLM_Response("gemini-2.5-flash", system_prompt, prompt, temperature=temperature)
+    timings["generate_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+async def summarize_pdf(pdf_path, content_hash: str = None):
     """
     Summarize the content of the uploaded PDF using LLM.
+    Long documents are summarized section by section (concurrently) and the
+    section summaries merged in a final call.
     Args:
         pdf_path (str): Path to the uploaded PDF file.
+        content_hash (str, optional): sha256 of the file, used as the extracted-text cache key.
     Returns:
-        str: Summary of the PDF content.
+        tuple: (summary of the PDF content, per-stage timings in ms)
     """
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    
-    # Use LLM to generate summary
-    summary_prompt = f"Please provide a comprehensive summary of the following legal document:\n\n{text}"
-    summary = await get_LLM_Response("gemini-2.5-flash", SYSTEM_PROMPT_SUMMARIZE, summary_prompt)
-    return summary
+    timings = {}
+    pages = await _load_pages(pdf_path, content_hash, timings)
+
+    if not needs_map_reduce(pages):
+        text = "\n".join(pages)
+        summary_prompt = f"Please provide a comprehensive summary of the following legal document:\n\n{text}"
+        summary = await _single_call(SYSTEM_PROMPT_SUMMARIZE, summary_prompt, timings)
+        return summary, timings
+
+    async def summarize_section(section):
+        prompt = (
+            f"Summarize this section ({section.label}) of a longer legal document. Keep every party, date, "
+            f"section of law, amount and decision it mentions.\n\n{section.text}"
+        )
+        return await get_LLM_Response(MAP_MODEL, SYSTEM_PROMPT_SUMMARIZE, prompt)
+
+    async def merge_summaries(partials):
+        joined = "\n\n".join(f"Part {i}:\n{partial}" for i, partial in enumerate(partials, start=1))
+        prompt = (
+            "The following are summaries of consecutive parts of one legal document, in order. "
+            "Merge them into one comprehensive summary of the whole document, removing repetition.\n\n" + joined
+        )
+        return await get_LLM_Response("gemini-2.5-flash", SYSTEM_PROMPT_SUMMARIZE, prompt)
 
-async def extract_events_and_dates(pdf_path):
+    summary, stage_timings = await map_reduce(split_sections(pages), summarize_section, merge_summaries, "tools.summarize")
+    timings.update(stage_timings)
+    return summary, timings
+
+async def extract_events_and_dates(pdf_path, content_hash: str = None):
     """
     Extract all dates from the PDF and provide a short description of what happened at each date using LLM.
+    Long documents are processed section by section (concurrently) and the
+    partial timelines merged in a final call.
     Args:
         pdf_path (str): Path to the uploaded PDF file.
+        content_hash (str, optional): sha256 of the file, used as the extracted-text cache key.
     Returns:
-        str: JSON string containing events and dates extracted by LLM.
+        tuple: (timeline text extracted by LLM, per-stage timings in ms)
     """
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    
-    # Use LLM to extract events and dates
-    events_prompt = f"""Please analyze the following legal document and extract all dates mentioned along with the events that occurred on those dates. 
-    
-    IMPORTANT: Return ONLY a formatted timeline text, NOT JSON. Use this exact format:
-    
-    Case Timeline
-    
-    July 10, 2025, 18:00 IST – July 11, 2025, 02:00 IST – Unauthorized access and data exfiltration from the company server; traced to the accused's IP address.
-    
-    July 15, 2025, 11:30 IST – FIR filed by Mr. Ankit Sharma, CTO of Innovatech Solutions, at the Cyber Crime Police Station, Bengaluru.
-    
-    August 03, 2025, 07:15 IST – Accused arrested from his residence; laptop, hard drives, and mobile phone seized for forensic analysis.
+    timings = {}
+    pages = await _load_pages(pdf_path, content_hash, timings)
+
+    if not needs_map_reduce(pages):
+        text = "\n".join(pages)
+        events_prompt = f"""Please analyze the following legal document and extract all dates mentioned along with the events that occurred on those dates. 
     
-    Do NOT return JSON format. Do NOT use asterisks (*) or any markdown formatting. Return only the formatted timeline text as shown above using plain text.
+    {EVENTS_FORMAT_INSTRUCTIONS}
     
     Document content:
     {text}"""
-    
-    events_response = await get_LLM_Response("gemini-2.5-flash", SYSTEM_PROMPT_EXTRACT_EVENTS_DATES, events_prompt)
-    return events_response
+        events = await _single_call(SYSTEM_PROMPT_EXTRACT_EVENTS_DATES, events_prompt, timings, temperature=0.2)
+        return events, timings
+
+    async def events_in_section(section):
+        prompt = (
+            f"Extract every date in this section ({section.label}) of a longer legal document with the event that "
+            f"occurred on it.\n\n{EVENTS_FORMAT_INSTRUCTIONS}\n\nDocument content:\n{section.text}"
+        )
+        return await get_LLM_Response(MAP_MODEL, SYSTEM_PROMPT_EXTRACT_EVENTS_DATES, prompt, temperature=0.2)
+
+    async def merge_timelines(partials):
+        joined = "\n\n".join(partials)
+        prompt = (
+            "The following timelines were extracted from consecutive parts of one legal document. Merge them into "
+            "one chronological timeline, combining entries that describe the same event.\n\n"
+            f"{EVENTS_FORMAT_INSTRUCTIONS}\n\nTimelines:\n{joined}"
+        )
+        return await get_LLM_Response(
+            "gemini-2.5-flash", SYSTEM_PROMPT_EXTRACT_EVENTS_DATES, prompt, temperature=0.2
+        )
+
+    events, stage_timings = await map_reduce(split_sections(pages), events_in_section, merge_timelines, "tools.events")
+    timings.update(stage_timings)
+    return events, timings
 
     
 SYSTEM_PROMPT_LEGAL_GUIDE = (
@@ -254,24 +316,20 @@ SYSTEM_PROMPT_KEYWORD_EXTRACTION = (
     'Output: {"keywords": ["cybercrime", "intellectual", "property", "theft"], "apiQuery": "cybercrime+intellectual+property+theft"}'
 )
 
-async def extract_text_from_pdf(pdf_path: str) -> str:
+async def extract_text_from_pdf(pdf_path: str, content_hash: str = None) -> str:
     """
-    Extract text from PDF using LangChain PyPDFLoader.
+    Extract text from PDF using the shared PDF extraction module.
     Args:
         pdf_path (str): Path to the PDF file
+        content_hash (str, optional): sha256 of the file, used as the extracted-text cache key
     Returns:
         str: Extracted text content
     """
     try:
-        # Use LangChain PyPDFLoader for text extraction
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+        pages = await extract_pdf_pages_async(pdf_path, content_hash=content_hash)
         
         # Combine all page content
-        text_parts = []
-        for doc in documents:
-            if doc.page_content and doc.page_content.strip():
-                text_parts.append(doc.page_content.strip())
+        text_parts = [page.strip() for page in pages if page and page.strip()]
         
         if not text_parts:
             raise Exception("No text content found in PDF")
@@ -294,7 +352,7 @@ async def extract_keywords_from_text(text: str) -> dict:
     """
     try:
         prompt = f"Extract legal keywords from this text:\n\n{text}"
-        response = await get_LLM_Response("gemini-2.5-flash", SYSTEM_PROMPT_KEYWORD_EXTRACTION, prompt)
+        response = await get_LLM_Response("gemini-2.5-flash", SYSTEM_PROMPT_KEYWORD_EXTRACTION, prompt, temperature=0.0)
         
         # Parse JSON response
         try:
@@ -444,12 +502,13 @@ def format_case_results(docs: list) -> list:
     
     return formatted_cases
 
-async def find_similar_cases(query: str = None, pdf_path: str = None) -> dict:
+async def find_similar_cases(query: str = None, pdf_path: str = None, content_hash: str = None) -> dict:
     """
     Find similar cases based on query text or PDF content.
     Args:
         query (str, optional): Text query
         pdf_path (str, optional): Path to PDF file
+        content_hash (str, optional): sha256 of the PDF, used as the extracted-text cache key
     Returns:
         dict: Formatted case results
     """
@@ -461,7 +520,7 @@ async def find_similar_cases(query: str = None, pdf_path: str = None) -> dict:
         # Determine input text
         if pdf_path:
             print("Extracting text from PDF...")
-            input_text = await extract_text_from_pdf(pdf_path)
+            input_text = await extract_text_from_pdf(pdf_path, content_hash=content_hash)
             print(f"Extracted text length: {len(input_text)} characters")
         elif query:
             input_text = query
@@ -1,41 +1,108 @@
 # app/utils/chunker.py
+import os
 import re
-from typing import List
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Tuple
+from .pdf_extract import iter_pdf_pages
 
-def simple_text_extractor(filepath: str) -> str:
-    # very simple: if .txt just read, if .pdf use pdfplumber
-    if filepath.lower().endswith(".txt"):
-        with open(filepath, "r", encoding="utf-8") as f:
-            return f.read()
-    elif filepath.lower().endswith(".pdf"):
-        try:
-            import pdfplumber
-        except ImportError:
-            raise RuntimeError("pdfplumber required for pdf processing")
-        text = []
-        with pdfplumber.open(filepath) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text() or ""
-                text.append(page_text)
-        return "\n".join(text)
+# .txt files are streamed in blocks of this many characters
+TEXT_BLOCK_CHARS = 64 * 1024
+# chunking defaults; changing them requires a reindex (see reindex_service)
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+_WS = re.compile(r'\s+')
+
+@dataclass
+class TextChunk:
+    text: str
+    page: int  # 1-based page the chunk starts on
+    char_start: int  # offsets into the whitespace-normalised document text
+    char_end: int
+
+def iter_pages(filepath: str, content_hash: str = None) -> Iterator[Tuple[int, str]]:
+    # yields (page_number, text) one page at a time; plain text files count as a single page
+    if filepath.lower().endswith(".pdf"):
+        for number, text in iter_pdf_pages(filepath, content_hash=content_hash):
+            # pages are newline-separated, like the original whole-text extractor
+            yield number, text + "\n"
     else:
-        # fallback: read raw
-        with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-
-def chunk_text(text: str, max_chars: int = 1000, overlap: int = 200) -> List[str]:
-    text = re.sub(r'\s+', ' ', text).strip()
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + max_chars
-        chunk = text[start:end]
-        # try to not cut mid-sentence: go back to last period within chunk
-        if end < len(text):
-            last_period = chunk.rfind('. ')
-            if last_period != -1 and last_period > max_chars//2:
-                chunk = chunk[:last_period+1]
-                end = start + len(chunk)
-        chunks.append(chunk.strip())
-        start = max(end - overlap, end)  # move forward with overlap
-    return chunks
+        # .txt, or fallback: read raw
+        errors = "strict" if filepath.lower().endswith(".txt") else "ignore"
+        with open(filepath, "r", encoding="utf-8", errors=errors) as f:
+            while True:
+                block = f.read(TEXT_BLOCK_CHARS)
+                if not block:
+                    break
+                yield 1, block
+
+def simple_text_extractor(filepath: str) -> str:
+    # very simple: if .txt just read, if .pdf use the shared pdf extractor
+    return "".join(text for _, text in iter_pages(filepath))
+
+def iter_chunks(pages: Iterable[Tuple[int, str]], max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> Iterator[TextChunk]:
+    """
+    Incrementally chunk a stream of (page_number, text) pairs.
+    Whitespace is collapsed as text arrives, consecutive chunks share up to
+    `overlap` characters, and only the not-yet-emitted tail is kept in memory.
+    """
+    overlap = min(overlap, max_chars // 2)
+    buf = ""  # normalised text not yet fully consumed
+    buf_start = 0  # document offset of buf[0]
+    pos = 0  # start of the next chunk inside buf
+    marks = []  # (document offset, page number) where each page begins
+    pending_space = False
+
+    def page_at(offset: int) -> int:
+        page = marks[0][1] if marks else 1
+        for start, number in marks:
+            if start > offset:
+                break
+            page = number
+        return page
+
+    def take(exhausted: bool):
+        nonlocal buf, buf_start, pos
+        while pos < len(buf) and (exhausted or len(buf) - pos > max_chars):
+            end = pos + max_chars
+            chunk = buf[pos:end]
+            # try to not cut mid-sentence: go back to last period within chunk
+            if end < len(buf):
+                last_period = chunk.rfind('. ')
+                if last_period != -1 and last_period > max_chars // 2:
+                    chunk = chunk[:last_period + 1]
+                    end = pos + len(chunk)
+            text = chunk.strip()
+            if text:
+                start = buf_start + pos + (len(chunk) - len(chunk.lstrip()))
+                yield TextChunk(text=text, page=page_at(start), char_start=start, char_end=start + len(text))
+            if end >= len(buf):
+                pos = len(buf)
+                break
+            pos = max(end - overlap, pos + 1)  # move forward with overlap
+        # drop consumed text and page marks that can no longer be referenced
+        buf_start += pos
+        buf = buf[pos:]
+        pos = 0
+        while len(marks) > 1 and marks[1][0] <= buf_start:
+            marks.pop(0)
+
+    for number, page_text in pages:
+        text = _WS.sub(' ', page_text)
+        if not buf and buf_start == 0:
+            text = text.lstrip()  # strip the start of the document
+        elif pending_space and text and not text.startswith(' '):
+            text = ' ' + text
+        # defer trailing whitespace so the end of the document is stripped
+        pending_space = text.endswith(' ') or (pending_space and not text)
+        text = text.rstrip(' ')
+        if not text:
+            continue
+        if not marks or marks[-1][1] != number:
+            marks.append((buf_start + len(buf) + (1 if text.startswith(' ') else 0), number))
+        buf += text
+        yield from take(exhausted=False)
+    yield from take(exhausted=True)
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    return [chunk.text for chunk in iter_chunks([(1, text)], max_chars=max_chars, overlap=overlap)]
@@ -0,0 +1,184 @@
+# app/utils/embedding_cache.py
+# Persistent embedding cache: in-memory LRU in front of a size-bounded SQLite store.
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from . import metrics
+
+load_dotenv()
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite3"))
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+EMBED_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBED_CACHE_MEMORY_ENTRIES", "10000"))
+
+def _pack(vector) -> bytes:
+    # vectors are stored as float32 blobs (4 bytes per dimension)
+    return array("f", vector).tobytes()
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingCache:
+    """
+    Cache of embeddings keyed by (model, task_type, sha256(text)).
+    Models share the file but never see each other's vectors; entries of
+    models no longer in use are only dropped by the invalidate CLI (below)
+    or by LRU eviction.
+    """
+
+    def __init__(self, path: str, model: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+                 memory_entries: int = EMBED_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        metrics.set_gauge("embedding_cache.disk_entries", self._count)
+
+    def _key(self, task_type: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{task_type}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, blob: bytes):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, task_type: str, texts: List[str]) -> Dict[int, List[float]]:
+        """Return {index: vector} for every text found in the cache."""
+        keys = [self._key(task_type, t) for t in texts]
+        found = {}
+        with self._lock:
+            missing = []
+            for i, key in enumerate(keys):
+                blob = self._memory.get(key)
+                if blob is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = blob
+                else:
+                    missing.append(i)
+            if missing:
+                wanted = {}
+                for i in missing:
+                    wanted.setdefault(keys[i], []).append(i)
+                key_list = list(wanted)
+                disk_hits = []
+                for start in range(0, len(key_list), 500):
+                    part = key_list[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        for i in wanted[key]:
+                            found[i] = blob
+                        self._remember(key, blob)
+                        disk_hits.append(key)
+                if disk_hits:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in disk_hits]
+                    )
+                    self._conn.commit()
+        hits = len(found)
+        metrics.incr("embedding_cache.hits", hits)
+        metrics.incr("embedding_cache.misses", len(texts) - hits)
+        return {i: _unpack(blob) for i, blob in found.items()}
+
+    def get(self, task_type: str, text: str) -> Optional[List[float]]:
+        return self.get_many(task_type, [text]).get(0)
+
+    def put_many(self, task_type: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(self._key(task_type, t), self.model, _pack(v), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            for key, _, blob, _ in rows:
+                self._remember(key, blob)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+        metrics.set_gauge("embedding_cache.disk_entries", self._count)
+
+    def put(self, task_type: str, text: str, vector: List[float]):
+        self.put_many(task_type, [text], [vector])
+
+    def _evict(self):
+        # drop the least recently used entries down to 90% of the limit
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self._count -= excess
+            metrics.incr("embedding_cache.evictions", excess)
+
+    def invalidate(self, keep_current_model: bool = False):
+        """Drop cached vectors: all of them, or only those of other models."""
+        with self._lock:
+            if keep_current_model:
+                self._conn.execute("DELETE FROM embeddings WHERE model != ?", (self.model,))
+            else:
+                self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._memory.clear()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        metrics.set_gauge("embedding_cache.disk_entries", self._count)
+
+    def stats(self) -> dict:
+        hits = metrics.get_counter("embedding_cache.hits")
+        misses = metrics.get_counter("embedding_cache.misses")
+        return {
+            "model": self.model,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._count,
+        }
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+def get_embedding_cache(model: str) -> Optional[EmbeddingCache]:
+    """Return the process-wide cache for a model (None when caching is disabled)."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        cache = _caches.get(model)
+        if cache is None:
+            cache = _caches[model] = EmbeddingCache(EMBED_CACHE_PATH, model)
+        return cache
+
+if __name__ == "__main__":
+    # python -m app.utils.embedding_cache [--all]  -> drop vectors of other models (or all of them)
+    from .embeddings_client import cache_model
+    cache = EmbeddingCache(EMBED_CACHE_PATH, cache_model())
+    cache.invalidate(keep_current_model="--all" not in sys.argv)
+    print(cache.stats())
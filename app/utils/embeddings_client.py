@@ -1,24 +1,143 @@
 # app/utils/embeddings_client.py
 import os
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
 from dotenv import load_dotenv
-import google.generativeai as genai
+from .embedding_cache import get_embedding_cache
+from .llm_provider import get_provider
+from .llm_scheduler import get_scheduler
 
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINIAI_API_KEY")
 EMBED_MODEL = os.getenv("MODEL_FOR_EMBEDDING", "models/text-embedding-004")
+# batching / concurrency knobs for bulk embedding (ingestion)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "4"))  # per batch; single embeds use LLM_MAX_RETRIES
 
-# Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+def cache_model() -> str:
+    # vectors from another provider (e.g. the fake one) must never be served for the real model
+    provider = get_provider()
+    return EMBED_MODEL if provider.name == "gemini" else f"{provider.name}:{EMBED_MODEL}"
 
-def get_embedding(text: str):
-    # returns list[float]
+def _cache():
+    return get_embedding_cache(cache_model())
+
+def get_embedding(text: str, task_type: str = "retrieval_document"):
+    # returns list[float]; served from the local cache when this text was embedded before
+    cache = _cache()
+    if cache is not None:
+        cached = cache.get(task_type, text)
+        if cached is not None:
+            return cached
+    try:
+        vector = get_scheduler().run_sync(
+            EMBED_MODEL,
+            lambda: get_provider().embed(EMBED_MODEL, text, task_type),
+            key=(task_type, text),
+        )
+    except Exception as e:
+        print(f"Error getting embedding with model {EMBED_MODEL}: {e}")
+        raise e
+    if cache is not None:
+        cache.put(task_type, text, vector)
+    return vector
+
+async def get_embedding_async(text: str, task_type: str = "retrieval_document"):
+    # non-blocking variant of get_embedding for the async query path
+    cache = _cache()
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, task_type, text)
+        if cached is not None:
+            return cached
     try:
-        result = genai.embed_content(
-            model=EMBED_MODEL,
-            content=text,
-            task_type="retrieval_document"
+        vector = await get_scheduler().run(
+            EMBED_MODEL,
+            lambda: get_provider().embed_async(EMBED_MODEL, text, task_type),
+            key=(task_type, text),
         )
-        return result['embedding']
     except Exception as e:
         print(f"Error getting embedding with model {EMBED_MODEL}: {e}")
         raise e
+    if cache is not None:
+        await asyncio.to_thread(cache.put, task_type, text, vector)
+    return vector
+
+def _embed_batch_with_retry(texts: List[str], task_type: str, max_retries: int) -> List[List[float]]:
+    """Embed one batch in a single request (rate limited and retried by the LLM scheduler)."""
+    try:
+        return get_scheduler().run_sync(
+            EMBED_MODEL,
+            lambda: get_provider().embed_batch(EMBED_MODEL, texts, task_type),
+            max_retries=max_retries,
+        )
+    except Exception as e:
+        print(f"Error getting batch embedding with model {EMBED_MODEL}: {e}")
+        raise e
+
+def get_embeddings_batch(
+    texts: List[str],
+    task_type: str = "retrieval_document",
+    batch_size: int = None,
+    max_concurrency: int = None,
+    max_retries: int = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> List[List[float]]:
+    """
+    Embed many texts using batched requests with bounded concurrency.
+    Texts already in the embedding cache are not sent to the API.
+    Args:
+        texts (List[str]): Texts to embed.
+        task_type (str): Gemini embedding task type.
+        batch_size (int, optional): Texts per request (defaults to EMBED_BATCH_SIZE).
+        max_concurrency (int, optional): Requests in flight (defaults to EMBED_CONCURRENCY).
+        max_retries (int, optional): Retries per batch (defaults to EMBED_MAX_RETRIES).
+        on_progress (callable, optional): Called with (embedded, total) as batches finish.
+    Returns:
+        List[List[float]]: One vector per input text, in input order.
+    """
+    if not texts:
+        return []
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_concurrency = max_concurrency or EMBED_CONCURRENCY
+    max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+
+    cache = _cache()
+    cached = cache.get_many(task_type, texts) if cache is not None else {}
+    if len(cached) == len(texts):
+        if on_progress:
+            on_progress(len(texts), len(texts))
+        return [cached[i] for i in range(len(texts))]
+    missing = [i for i in range(len(texts)) if i not in cached]
+    to_embed = [texts[i] for i in missing]
+
+    batches = [to_embed[i:i + batch_size] for i in range(0, len(to_embed), batch_size)]
+    started = time.perf_counter()
+    results = [None] * len(batches)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {
+            pool.submit(_embed_batch_with_retry, batch, task_type, max_retries): i
+            for i, batch in enumerate(batches)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            done += len(batches[i])
+            if on_progress:
+                on_progress(len(cached) + done, len(texts))
+    elapsed = time.perf_counter() - started
+
+    new_vectors = [vec for batch in results for vec in batch]
+    if cache is not None:
+        cache.put_many(task_type, to_embed, new_vectors)
+    rate = len(to_embed) / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"Embedded {len(to_embed)} chunks in {elapsed:.2f}s ({rate:.1f} chunks/sec, "
+        f"batch_size={batch_size}, concurrency={max_concurrency}, cache hits={len(cached)})"
+    )
+    vectors = [cached.get(i) for i in range(len(texts))]
+    for i, vec in zip(missing, new_vectors):
+        vectors[i] = vec
+    return vectors
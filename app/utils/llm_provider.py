@@ -0,0 +1,359 @@
+# app/utils/llm_provider.py
+# Backends for chat and embedding calls. "gemini" talks to the Gemini API; "fake" answers
+# locally and deterministically (with simulated latency) for load tests and offline benchmarks.
+# Callers go through LLMmodel / embeddings_client, so the LLM scheduler sits in front of either.
+import os
+import re
+import math
+import random
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Callable, List
+import numpy as np
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+load_dotenv()
+# which backend serves chat and embedding calls
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_PROVIDERS = ("gemini", "fake")
+GEMINI_API_KEY = os.getenv("GEMINIAI_API_KEY")
+# GenerativeModel clients kept per (model, system prompt); call sites use a few static prompts
+LLM_MODEL_CACHE_SIZE = int(os.getenv("LLM_MODEL_CACHE_SIZE", "64"))
+
+# fake provider: "echo" repeats the user message, "canned" always returns FAKE_LLM_RESPONSE
+FAKE_LLM_MODE = os.getenv("FAKE_LLM_MODE", "echo")
+FAKE_LLM_RESPONSE = os.getenv("FAKE_LLM_RESPONSE", "This is a canned response from the fake LLM provider.")
+# completion length cap (in words) for echo mode
+FAKE_LLM_MAX_WORDS = int(os.getenv("FAKE_LLM_MAX_WORDS", "120"))
+# latency distributions: "fixed:MS", "uniform:LOW_MS,HIGH_MS" or "lognormal:MEDIAN_MS,SIGMA";
+# chat latency is time to first token, the rest of the answer then streams at FAKE_LLM_TOKENS_PER_SECOND
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:400,0.4")
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "150"))
+FAKE_EMBED_LATENCY = os.getenv("FAKE_EMBED_LATENCY", "lognormal:60,0.3")
+# share of fake calls failing with a retryable 429/503, to exercise the scheduler's backoff
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+# seeds the latency and error draws; outputs and embeddings are deterministic regardless
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+# 0: the dimension of the configured embedding model (see EMBED_DIMENSIONS)
+FAKE_EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", "0"))
+
+# output dimension of the embedding models the fake provider stands in for
+EMBED_DIMENSIONS = {
+    "text-embedding-004": 768,
+    "embedding-001": 768,
+    "gemini-embedding-001": 3072,
+}
+DEFAULT_EMBED_DIMENSION = 768
+
+_WORD = re.compile(r"\w+")
+
+class LLMProvider:
+    """
+    Interface of a chat / embedding backend. Methods issue one upstream
+    request each; rate limiting, retries and single-flight are left to the
+    LLM scheduler, so errors should carry an HTTP-style `.code` when retryable.
+    """
+
+    name = "base"
+
+    async def generate(self, model: str, system_prompt: str, user_query: str,
+                       max_output_tokens: int = None, temperature: float = None) -> str:
+        raise NotImplementedError
+
+    async def open_stream(self, model: str, system_prompt: str, user_query: str,
+                          max_output_tokens: int = None, temperature: float = None) -> "TextStream":
+        """Send the request and return once the response starts; the text is read from the returned stream."""
+        raise NotImplementedError
+
+    def embed(self, model: str, text: str, task_type: str) -> List[float]:
+        raise NotImplementedError
+
+    async def embed_async(self, model: str, text: str, task_type: str) -> List[float]:
+        raise NotImplementedError
+
+    def embed_batch(self, model: str, texts: List[str], task_type: str) -> List[List[float]]:
+        raise NotImplementedError
+
+class TextStream:
+    """Async iterator over the text pieces of a streamed completion; cancel() stops it early."""
+
+    def __init__(self, pieces: AsyncIterator[str], cancel: Callable[[], None] = None):
+        self._pieces = pieces
+        self._cancel = cancel
+
+    def __aiter__(self):
+        return self._pieces
+
+    def cancel(self):
+        if self._cancel is not None:
+            self._cancel()
+
+# --- Gemini ---------------------------------------------------------------
+
+class ModelRegistry:
+    """
+    One reusable GenerativeModel per (model, system prompt). The system prompt
+    is passed as the model's system_instruction, so it is sent as a system turn
+    instead of being re-wrapped into every user message.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # least recently used first
+
+    def get(self, model: str, system_prompt: str = None) -> genai.GenerativeModel:
+        key = (model, system_prompt or None)
+        with self._lock:
+            generative_model = self._models.get(key)
+            if generative_model is not None:
+                self._models.move_to_end(key)
+                return generative_model
+            generative_model = genai.GenerativeModel(model, system_instruction=system_prompt or None)
+            self._models[key] = generative_model
+            while len(self._models) > self.max_entries:
+                self._models.popitem(last=False)
+            return generative_model
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+def generation_config(max_output_tokens: int = None, temperature: float = None):
+    # None: the model's default. On 2.5 models max_output_tokens includes thinking tokens.
+    config = {}
+    if max_output_tokens is not None:
+        config["max_output_tokens"] = max_output_tokens
+    if temperature is not None:
+        config["temperature"] = temperature
+    return genai.GenerationConfig(**config) if config else None
+
+def response_text(response) -> str:
+    # Handle potential content filtering or empty responses
+    if response.candidates and len(response.candidates) > 0:
+        candidate = response.candidates[0]
+        if candidate.finish_reason == 1:  # STOP - normal completion
+            try:
+                return response.text.strip()
+            except Exception:
+                return "Response generated but could not be accessed. Please try again."
+        elif candidate.finish_reason == 2:  # MAX_TOKENS
+            try:
+                return response.text.strip() if response.text else "Response was truncated due to length limits."
+            except Exception:
+                return "Response was truncated due to length limits."
+        elif candidate.finish_reason == 3:  # SAFETY
+            return "I cannot provide a response to this query due to safety concerns."
+        elif candidate.finish_reason == 4:  # RECITATION
+            return "I cannot provide a response to this query due to recitation concerns."
+        else:
+            return "I encountered an issue generating a response. Please try rephrasing your question."
+    else:
+        return "No response generated. Please try again with a different query."
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, model_cache_size: int = None):
+        # configured on first use rather than at import, so other providers never touch the API
+        genai.configure(api_key=api_key)
+        self.models = ModelRegistry(model_cache_size or LLM_MODEL_CACHE_SIZE)
+
+    async def generate(self, model, system_prompt, user_query, max_output_tokens=None, temperature=None):
+        generative_model = self.models.get(model, system_prompt)
+        config = generation_config(max_output_tokens, temperature)
+        response = await generative_model.generate_content_async(user_query, generation_config=config)
+        return response_text(response)
+
+    async def open_stream(self, model, system_prompt, user_query, max_output_tokens=None, temperature=None):
+        generative_model = self.models.get(model, system_prompt)
+        config = generation_config(max_output_tokens, temperature)
+        response = await generative_model.generate_content_async(user_query, generation_config=config, stream=True)
+
+        async def pieces():
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except Exception:
+                    # no text part (e.g. the final chunk only carries the finish reason)
+                    text = ""
+                if text:
+                    yield text
+
+        def cancel():
+            # the SDK exposes no public cancel; stop the underlying streaming call directly
+            call = getattr(response, "_iterator", None)
+            if call is not None and hasattr(call, "cancel"):
+                call.cancel()
+
+        return TextStream(pieces(), cancel)
+
+    def embed(self, model, text, task_type):
+        return genai.embed_content(model=model, content=text, task_type=task_type)["embedding"]
+
+    async def embed_async(self, model, text, task_type):
+        result = await genai.embed_content_async(model=model, content=text, task_type=task_type)
+        return result["embedding"]
+
+    def embed_batch(self, model, texts, task_type):
+        return genai.embed_content(model=model, content=texts, task_type=task_type)["embedding"]
+
+# --- Fake -----------------------------------------------------------------
+
+class FakeProviderError(Exception):
+    """Simulated upstream failure; `.code` is what the scheduler's retry policy looks at."""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} simulated upstream error")
+        self.code = code
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Turn a latency spec (see FAKE_LLM_LATENCY) into a sampler returning seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+        mu, sigma = math.log(values[0] / 1000), values[1]
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Bad latency spec '{spec}'. Use fixed:MS, uniform:LOW_MS,HIGH_MS or lognormal:MEDIAN_MS,SIGMA")
+
+@lru_cache(maxsize=65536)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """
+    Deterministic unit vector for `text`: the sum of per-word random vectors
+    (feature hashing), so texts sharing words score higher than unrelated ones
+    and retrieval still returns plausible neighbours.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        vector += _word_vector(word, dim)
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        vector = _word_vector(text, dim).copy()  # no words at all: still a stable vector
+        norm = float(np.linalg.norm(vector))
+    return (vector / norm).tolist()
+
+class FakeProvider(LLMProvider):
+    name = "fake"
+
+    def __init__(self, mode: str = None, response: str = None, latency: str = None, embed_latency: str = None,
+                 tokens_per_second: float = None, error_rate: float = None, embed_dim: int = None, seed: int = None):
+        self.mode = mode or FAKE_LLM_MODE
+        if self.mode not in ("echo", "canned"):
+            raise ValueError(f"Unknown fake LLM mode '{self.mode}'. Use echo or canned")
+        self.response = FAKE_LLM_RESPONSE if response is None else response
+        self._rng = random.Random(FAKE_LLM_SEED if seed is None else seed)
+        self._rng_lock = threading.Lock()
+        self._latency = parse_latency(latency or FAKE_LLM_LATENCY, self._rng)
+        self._embed_latency = parse_latency(embed_latency or FAKE_EMBED_LATENCY, self._rng)
+        self.tokens_per_second = tokens_per_second or FAKE_LLM_TOKENS_PER_SECOND
+        self.error_rate = FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+        self.embed_dim = embed_dim if embed_dim is not None else FAKE_EMBED_DIM
+
+    def dimension(self, model: str) -> int:
+        return self.embed_dim or EMBED_DIMENSIONS.get(model.split("/")[-1], DEFAULT_EMBED_DIMENSION)
+
+    def completion(self, user_query: str, max_output_tokens: int = None) -> str:
+        if self.mode == "canned":
+            return self.response
+        words = user_query.split()[:FAKE_LLM_MAX_WORDS]
+        if max_output_tokens:
+            words = words[:max_output_tokens]
+        return " ".join(words)
+
+    def _draw(self, sampler: Callable[[], float]):
+        # (delay seconds, error or None); random.Random is not safe to share between threads unlocked
+        with self._rng_lock:
+            delay = max(0.0, sampler())
+            failed = self.error_rate and self._rng.random() < self.error_rate
+            code = self._rng.choice((429, 503)) if failed else None
+        return delay, (FakeProviderError(code) if code else None)
+
+    def _generation_seconds(self, text: str) -> float:
+        return len(text.split()) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    async def generate(self, model, system_prompt, user_query, max_output_tokens=None, temperature=None):
+        delay, error = self._draw(self._latency)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        text = self.completion(user_query, max_output_tokens)
+        await asyncio.sleep(self._generation_seconds(text))
+        return text
+
+    async def open_stream(self, model, system_prompt, user_query, max_output_tokens=None, temperature=None):
+        delay, error = self._draw(self._latency)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        words = self.completion(user_query, max_output_tokens).split(" ")
+        pause = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        async def pieces():
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(pause)
+                yield word if i == 0 else " " + word
+
+        # closing the consuming generator stops this one; there is no upstream call to cancel
+        return TextStream(pieces())
+
+    def embed(self, model, text, task_type):
+        delay, error = self._draw(self._embed_latency)
+        time.sleep(delay)
+        if error:
+            raise error
+        return fake_embedding(text, self.dimension(model))
+
+    async def embed_async(self, model, text, task_type):
+        delay, error = self._draw(self._embed_latency)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return fake_embedding(text, self.dimension(model))
+
+    def embed_batch(self, model, texts, task_type):
+        # one request per batch, like Gemini's batched embed_content
+        delay, error = self._draw(self._embed_latency)
+        time.sleep(delay)
+        if error:
+            raise error
+        dim = self.dimension(model)
+        return [fake_embedding(text, dim) for text in texts]
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def create_provider(name: str = None) -> LLMProvider:
+    name = name or LLM_PROVIDER
+    if name == "gemini":
+        return GeminiProvider(GEMINI_API_KEY)
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown LLM provider '{name}'. Use one of {LLM_PROVIDERS}")
+
+def get_provider() -> LLMProvider:
+    """Return the process-wide provider (LLM_PROVIDER); Gemini is configured on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider()
+        return _provider
+
+def set_provider(provider: LLMProvider):
+    """Swap the process-wide provider (benchmarks and load tests)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,330 @@
+# app/utils/llm_scheduler.py
+# Central gate in front of every Gemini call: per-model rate limit and concurrency cap,
+# jittered exponential backoff on retryable errors, and single-flight for identical calls.
+import os
+import time
+import random
+import asyncio
+import threading
+import contextlib
+from collections import deque
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional
+from . import metrics
+
+# requests per minute per model, e.g. "gemini-2.5-flash=1000,models/text-embedding-004=1500";
+# models not listed get LLM_DEFAULT_RPM (0 = no rate limit)
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "600"))
+# upstream calls in flight per model; further callers queue
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+# HTTP statuses worth retrying (google.api_core exceptions carry the status as .code)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+def _parse_rate_limits(spec: str) -> Dict[str, float]:
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, rpm = item.split("=", 1)
+            limits[model.strip()] = float(rpm)
+    return limits
+
+def is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    return isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+class _TokenBucket:
+    """Reservation-style token bucket: every caller takes a token now and waits off any deficit."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate)  # up to one second of traffic in a burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token; returns the seconds to wait before using it."""
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def hold(self, seconds: float):
+        # the API said "slow down": nobody gets a token for `seconds`
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+class _Slots:
+    """
+    Counting semaphore usable from threads and event loops alike. A released
+    slot is handed straight to the oldest waiter, so waiters are served FIFO.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._used = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._used < self.limit and not self._waiters:
+                self._used += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        with self._lock:
+            if self._used < self.limit and not self._waiters:
+                self._used += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+            # the slot was handed over as the wait was cancelled: pass it on
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._used -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            waiter.get_loop().call_soon_threadsafe(_hand_over, waiter)
+
+def _hand_over(future: asyncio.Future):
+    # a cancelled waiter passes the slot on itself (see acquire_async)
+    if not future.done():
+        future.set_result(None)
+
+class _ModelGate:
+    def __init__(self, model: str, per_minute: float, concurrency: int):
+        self.name = model.split("/")[-1]
+        self.bucket = _TokenBucket(per_minute) if per_minute > 0 else None
+        self.slots = _Slots(concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _count(self, queued: int = 0, in_flight: int = 0):
+        with self._lock:
+            self._queued += queued
+            self._in_flight += in_flight
+            metrics.set_gauge(f"llm.{self.name}.queue_depth", self._queued)
+            metrics.set_gauge(f"llm.{self.name}.in_flight", self._in_flight)
+
+    def enter(self) -> float:
+        queued = time.perf_counter()
+        self._count(queued=1)
+        try:
+            delay = self.bucket.reserve() if self.bucket else 0.0
+            if delay:
+                time.sleep(delay)
+            self.slots.acquire()
+        finally:
+            self._count(queued=-1)
+        return self._entered(queued)
+
+    async def enter_async(self) -> float:
+        queued = time.perf_counter()
+        self._count(queued=1)
+        try:
+            delay = self.bucket.reserve() if self.bucket else 0.0
+            if delay:
+                await asyncio.sleep(delay)
+            await self.slots.acquire_async()
+        finally:
+            self._count(queued=-1)
+        return self._entered(queued)
+
+    def _entered(self, queued: float) -> float:
+        now = time.perf_counter()
+        metrics.observe(f"llm.{self.name}.wait", now - queued)
+        self._count(in_flight=1)
+        return now
+
+    def leave(self, started: float):
+        self.slots.release()
+        self._count(in_flight=-1)
+        metrics.observe(f"llm.{self.name}.call", time.perf_counter() - started)
+
+    def backoff(self, exc: BaseException, attempt: int, max_retries: int) -> Optional[float]:
+        """Seconds to wait before retry number `attempt`, or None to give up."""
+        if attempt > max_retries or not is_retryable(exc):
+            metrics.incr(f"llm.{self.name}.failures")
+            return None
+        # full jitter: spreads retries of a burst instead of synchronising them
+        delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+        if getattr(exc, "code", None) == 429:
+            metrics.incr(f"llm.{self.name}.rate_limited")
+            if self.bucket:
+                self.bucket.hold(delay)
+        metrics.incr(f"llm.{self.name}.retries")
+        print(f"{self.name} call failed ({exc}); retry {attempt}/{max_retries} in {delay:.1f}s")
+        return delay
+
+class LLMScheduler:
+    """
+    Runs upstream model calls. `call` is a zero-argument function that starts
+    one attempt (returning an awaitable for run / stream, a value for
+    run_sync). Calls with the same `key` that overlap share one attempt.
+    """
+
+    def __init__(self, rate_limits: Dict[str, float], default_rpm: float, concurrency: int, max_retries: int):
+        self.rate_limits = rate_limits
+        self.default_rpm = default_rpm
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._gates = {}
+        self._flights = {}  # (event loop or None, model, key) -> in-flight task / future
+        self._lock = threading.Lock()
+
+    def gate(self, model: str) -> _ModelGate:
+        with self._lock:
+            gate = self._gates.get(model)
+            if gate is None:
+                per_minute = self.rate_limits.get(model, self.rate_limits.get(model.split("/")[-1], self.default_rpm))
+                gate = self._gates[model] = _ModelGate(model, per_minute, self.concurrency)
+            return gate
+
+    async def run(self, model: str, call: Callable[[], Awaitable], key=None, max_retries: int = None):
+        if key is None:
+            return await self._attempts(model, call, max_retries)
+        flight = (asyncio.get_running_loop(), model, key)
+        with self._lock:
+            task = self._flights.get(flight)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(self._attempts(model, call, max_retries))
+                self._flights[flight] = task
+                task.add_done_callback(lambda done: self._land(flight, done))
+        if not leader:
+            metrics.incr(f"llm.{self.gate(model).name}.coalesced")
+        # one caller going away must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def run_sync(self, model: str, call: Callable, key=None, max_retries: int = None):
+        if key is None:
+            return self._attempts_sync(model, call, max_retries)
+        flight = (None, model, key)
+        with self._lock:
+            future = self._flights.get(flight)
+            leader = future is None
+            if leader:
+                future = self._flights[flight] = Future()
+        if not leader:
+            metrics.incr(f"llm.{self.gate(model).name}.coalesced")
+            return future.result()
+        try:
+            future.set_result(self._attempts_sync(model, call, max_retries))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._flights.pop(flight, None)
+        return future.result()
+
+    @contextlib.asynccontextmanager
+    async def stream(self, model: str, call: Callable[[], Awaitable], max_retries: int = None):
+        """Open a streaming call (retrying only the opening request) and hold its slot until the block exits."""
+        gate = self.gate(model)
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            started = await gate.enter_async()
+            try:
+                response = await call()
+                break
+            except BaseException as e:
+                # includes cancellation while the stream is opening (client went away)
+                gate.leave(started)
+                if not isinstance(e, Exception):
+                    raise
+                attempt += 1
+                delay = gate.backoff(e, attempt, max_retries)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+        try:
+            yield response
+        finally:
+            gate.leave(started)
+
+    def _land(self, flight, task: asyncio.Task):
+        with self._lock:
+            if self._flights.get(flight) is task:
+                del self._flights[flight]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an unawaited failure is not logged as lost
+
+    async def _attempts(self, model: str, call: Callable[[], Awaitable], max_retries: int = None):
+        gate = self.gate(model)
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            started = await gate.enter_async()
+            try:
+                return await call()
+            except Exception as e:
+                attempt += 1
+                delay = gate.backoff(e, attempt, max_retries)
+                if delay is None:
+                    raise
+            finally:
+                gate.leave(started)
+            await asyncio.sleep(delay)
+
+    def _attempts_sync(self, model: str, call: Callable, max_retries: int = None):
+        gate = self.gate(model)
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            started = gate.enter()
+            try:
+                return call()
+            except Exception as e:
+                attempt += 1
+                delay = gate.backoff(e, attempt, max_retries)
+                if delay is None:
+                    raise
+            finally:
+                gate.leave(started)
+            time.sleep(delay)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                _parse_rate_limits(LLM_RATE_LIMITS), LLM_DEFAULT_RPM, LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES
+            )
+        return _scheduler
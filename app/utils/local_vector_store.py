@@ -0,0 +1,341 @@
+# app/utils/local_vector_store.py
+# Embedded vector index: float32 vectors in a memory-mapped NumPy matrix, brute-force cosine top-k.
+import os
+import json
+import uuid
+import shutil
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+import numpy as np
+from dotenv import load_dotenv
+from .vector_store import SearchTuning, VectorStore
+
+load_dotenv()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "./vector_store")
+# rows reserved when a collection's matrix file is created; it doubles when full
+LOCAL_VECTOR_INITIAL_ROWS = int(os.getenv("LOCAL_VECTOR_INITIAL_ROWS", "1024"))
+
+@dataclass
+class LocalHit:
+    id: str
+    score: float
+    payload: dict = field(default_factory=dict)
+
+class _Collection:
+    """
+    One physical collection on disk:
+      vectors.f32  - (capacity x dim) float32 matrix of unit-normalised vectors (memmap)
+      points.db    - point id -> matrix row, doc_id, owner and JSON payload
+      meta.json    - dim and capacity
+    Rows of deleted points are reused by later upserts. Owners are kept as
+    small integer codes per row so a tenant-filtered search is a mask over
+    the same matrix product.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self.lock = threading.Lock()
+        self.matrix = np.memmap(self._matrix_path(), dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+        self.conn = sqlite3.connect(os.path.join(directory, "points.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(points)")}
+        if "owner" not in columns:
+            # collections created before tenant filtering
+            self.conn.execute("ALTER TABLE points ADD COLUMN owner TEXT")
+            self.conn.commit()
+        self.row_ids = [None] * self.capacity  # matrix row -> point id
+        self.rows = {}  # point id -> matrix row
+        self.owner_codes = {}  # owner -> code stored in self.owners
+        self.owners = np.full(self.capacity, -1, dtype=np.int32)
+        for point_id, row, owner in self.conn.execute("SELECT id, row, owner FROM points"):
+            self.row_ids[row] = point_id
+            self.rows[point_id] = row
+            if owner is not None:
+                self.owners[row] = self._owner_code(owner)
+        self.live = np.zeros(self.capacity, dtype=bool)
+        self.live[list(self.rows.values())] = True
+        self.free = [row for row in range(self.capacity - 1, -1, -1) if self.row_ids[row] is None]
+        self.high = max(self.rows.values(), default=-1) + 1  # rows at or above this were never used
+
+    @classmethod
+    def create(cls, directory: str, dim: int) -> "_Collection":
+        os.makedirs(directory, exist_ok=True)
+        capacity = LOCAL_VECTOR_INITIAL_ROWS
+        np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="w+", shape=(capacity, dim)).flush()
+        conn = sqlite3.connect(os.path.join(directory, "points.db"))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS points (id TEXT PRIMARY KEY, row INTEGER NOT NULL, doc_id INTEGER, owner TEXT, payload TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_points_doc_id ON points (doc_id)")
+        conn.commit()
+        conn.close()
+        cls._write_meta(directory, dim, capacity)
+        return cls(directory)
+
+    @staticmethod
+    def _write_meta(directory: str, dim: int, capacity: int):
+        tmp = os.path.join(directory, f"meta.json.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": dim, "capacity": capacity}, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    def _owner_code(self, owner: str) -> int:
+        return self.owner_codes.setdefault(owner, len(self.owner_codes))
+
+    def _matrix_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    def _grow(self, needed: int):
+        capacity = self.capacity
+        while capacity - self.capacity + len(self.free) < needed:
+            capacity *= 2
+        self.matrix.flush()
+        del self.matrix
+        # the file is extended in place; existing rows keep their offsets
+        with open(self._matrix_path(), "r+b") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.matrix = np.memmap(self._matrix_path(), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.free = list(range(capacity - 1, self.capacity - 1, -1)) + self.free
+        self.row_ids.extend([None] * (capacity - self.capacity))
+        self.live = np.concatenate([self.live, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.owners = np.concatenate([self.owners, np.full(capacity - self.capacity, -1, dtype=np.int32)])
+        self.capacity = capacity
+        self._write_meta(self.directory, self.dim, capacity)
+
+    def upsert(self, points: List[dict]):
+        with self.lock:
+            new = [p for p in points if str(p["id"]) not in self.rows]
+            if len(new) > len(self.free):
+                self._grow(len(new))
+            vectors = np.asarray([p["vector"] for p in points], dtype=np.float32)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector size {vectors.shape[1]} does not match collection size {self.dim}")
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+            records = []
+            for point, vector in zip(points, vectors):
+                point_id = str(point["id"])
+                row = self.rows.get(point_id)
+                if row is None:
+                    row = self.free.pop()
+                    self.rows[point_id] = row
+                    self.row_ids[row] = point_id
+                    self.high = max(self.high, row + 1)
+                self.matrix[row] = vector
+                self.live[row] = True
+                payload = point.get("payload") or {}
+                owner = payload.get("owner")
+                self.owners[row] = -1 if owner is None else self._owner_code(owner)
+                records.append((point_id, row, payload.get("doc_id"), owner, json.dumps(payload)))
+            self.matrix.flush()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points (id, row, doc_id, owner, payload) VALUES (?, ?, ?, ?, ?)", records
+            )
+            self.conn.commit()
+
+    def search(self, vector: List[float], limit: int, owner: str = None) -> List[LocalHit]:
+        return self.search_many([vector], limit, owner)[0]
+
+    def search_many(self, vectors: List[List[float]], limit: int, owner: str = None) -> List[List[LocalHit]]:
+        queries = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        with self.lock:
+            eligible = self.live[:self.high]
+            if owner is not None:
+                code = self.owner_codes.get(owner)
+                eligible = eligible & (self.owners[:self.high] == code) if code is not None else np.zeros_like(eligible)
+            count = int(eligible.sum())
+            if count == 0:
+                return [[] for _ in vectors]
+            # one matrix product for all queries; rows beyond the highest used one are never scored
+            scores = self.matrix[:self.high] @ queries.T
+            scores[~eligible] = -np.inf
+            k = min(limit, count)
+            tops = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                tops.append(top[np.argsort(-column[top])])
+            ids = sorted({self.row_ids[row] for top in tops for row in top})
+            payloads = {}
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                payloads.update(self.conn.execute(
+                    f"SELECT id, payload FROM points WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+            results = []
+            for column, top in zip(scores.T, tops):
+                results.append([
+                    LocalHit(id=self.row_ids[row], score=float(column[row]),
+                             payload=json.loads(payloads.get(self.row_ids[row]) or "{}"))
+                    for row in top
+                ])
+        return results
+
+    def delete_doc(self, doc_id: int):
+        with self.lock:
+            point_ids = [row[0] for row in self.conn.execute("SELECT id FROM points WHERE doc_id = ?", (doc_id,))]
+            for point_id in point_ids:
+                row = self.rows.pop(point_id)
+                self.row_ids[row] = None
+                self.live[row] = False
+                self.owners[row] = -1
+                self.free.append(row)
+            self.conn.execute("DELETE FROM points WHERE doc_id = ?", (doc_id,))
+            self.conn.commit()
+
+    def retrieve(self, point_ids: Iterable[str]) -> Dict[str, List[float]]:
+        with self.lock:
+            return {pid: self.matrix[self.rows[pid]].tolist() for pid in map(str, point_ids) if pid in self.rows}
+
+    def count(self, owner: str = None) -> int:
+        with self.lock:
+            if owner is None:
+                return len(self.rows)
+            return self.conn.execute("SELECT COUNT(*) FROM points WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def iter_points(self, batch_size: int, owner: str = None):
+        query = "SELECT id, row, payload FROM points"
+        params = ()
+        if owner is not None:
+            query += " WHERE owner = ?"
+            params = (owner,)
+        cursor = self.conn.cursor()
+        with self.lock:
+            cursor.execute(query + " ORDER BY row", params)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+                batch = [
+                    {"id": point_id, "vector": self.matrix[row].tolist(), "payload": json.loads(payload or "{}")}
+                    for point_id, row, payload in rows
+                ]
+            if not batch:
+                break
+            yield batch
+
+    def close(self):
+        with self.lock:
+            self.matrix.flush()
+            del self.matrix
+            self.conn.close()
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process backend for small tenants and test environments (no server).
+    Search is an exact, vectorised cosine scan, so latency grows linearly with
+    the collection; aliases live in aliases.json. Single process only.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = None):
+        super().__init__()
+        self.directory = directory or LOCAL_VECTOR_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._collections = {}
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.directory, collection_name)
+
+    def _aliases(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, "aliases.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_aliases(self, aliases: dict):
+        tmp = os.path.join(self.directory, f"aliases.json.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(aliases, f)
+        os.replace(tmp, os.path.join(self.directory, "aliases.json"))
+
+    def _physical(self, collection_name: str) -> str:
+        return self._aliases().get(collection_name, collection_name)
+
+    def _open(self, collection_name: str) -> _Collection:
+        physical = self._physical(collection_name)
+        with self._lock:
+            collection = self._collections.get(physical)
+            if collection is None:
+                if not os.path.exists(os.path.join(self._path(physical), "meta.json")):
+                    raise ValueError(f"Collection {collection_name} not found")
+                collection = self._collections[physical] = _Collection(self._path(physical))
+            return collection
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._path(collection_name), "meta.json"))
+
+    def list_collections(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory) if self.collection_exists(name))
+
+    def create_physical_collection(self, collection_name: str, vector_size: int, multitenant: bool = False,
+                                   profile: str = None):
+        # owner is always tracked per row, so shared collections need no extra setup here;
+        # search is exact, so there is no index or quantization profile to apply
+        if self.collection_exists(collection_name):
+            raise ValueError(f"Collection {collection_name} already exists")
+        with self._lock:
+            self._collections[collection_name] = _Collection.create(self._path(collection_name), vector_size)
+
+    def delete_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(self._path(collection_name), ignore_errors=True)
+            # like Qdrant, aliases of a deleted collection go with it
+            aliases = self._aliases()
+            remaining = {alias: target for alias, target in aliases.items() if target != collection_name}
+            if len(remaining) != len(aliases):
+                self._write_aliases(remaining)
+        self.forget_collections()
+
+    def resolve_alias(self, alias_name: str):
+        return self._aliases().get(alias_name)
+
+    def swap_alias(self, alias_name: str, collection_name: str):
+        with self._lock:
+            aliases = self._aliases()
+            aliases[alias_name] = collection_name
+            self._write_aliases(aliases)
+        if alias_name != collection_name and self.collection_exists(alias_name):
+            # legacy layout: a real collection with the logical name is replaced by the alias
+            self.delete_collection(alias_name)
+
+    def upsert(self, collection_name: str, points: List[dict], wait: bool = True):
+        # writes are applied synchronously, so `wait` makes no difference here
+        if points:
+            self._open(collection_name).upsert(points)
+
+    def search(self, collection_name: str, vector: List[float], limit: int = 5, owner: str = None,
+               tuning: SearchTuning = None) -> List[LocalHit]:
+        return self._open(collection_name).search(vector, limit, owner)
+
+    def search_batch(self, collection_name: str, vectors: List[List[float]], limit: int = 5,
+                     owner: str = None, tuning: SearchTuning = None) -> List[List[LocalHit]]:
+        return self._open(collection_name).search_many(vectors, limit, owner)
+
+    def iter_points(self, collection_name: str, batch_size: int = 256, owner: str = None):
+        return self._open(collection_name).iter_points(batch_size, owner)
+
+    def count_points(self, collection_name: str, owner: str = None) -> int:
+        return self._open(collection_name).count(owner)
+
+    def delete_doc_points(self, collection_name: str, doc_id: int):
+        try:
+            self._open(collection_name).delete_doc(doc_id)
+        except ValueError:
+            pass
+
+    def retrieve_vectors(self, collection_name: str, point_ids: Iterable[str], batch_size: int = 256) -> Dict[str, List[float]]:
+        return self._open(collection_name).retrieve(point_ids)
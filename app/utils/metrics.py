@@ -0,0 +1,54 @@
+# app/utils/metrics.py
+# Minimal in-process metrics registry (counters, gauges, latency summaries), served at /api/metrics.
+import threading
+from collections import defaultdict, deque
+
+# number of recent samples kept per timing for percentile estimates
+_RESERVOIR_SIZE = 2048
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_timings = defaultdict(lambda: {"count": 0, "sum": 0.0, "max": 0.0, "recent": deque(maxlen=_RESERVOIR_SIZE)})
+
+def incr(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+def observe(name: str, seconds: float):
+    """Record one latency sample (in seconds)."""
+    with _lock:
+        t = _timings[name]
+        t["count"] += 1
+        t["sum"] += seconds
+        t["max"] = max(t["max"], seconds)
+        t["recent"].append(seconds)
+
+def get_counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def snapshot() -> dict:
+    """Return a JSON-serialisable view of all metrics."""
+    with _lock:
+        timings = {}
+        for name, t in _timings.items():
+            recent = sorted(t["recent"])
+            timings[name] = {
+                "count": t["count"],
+                "avg_ms": round(t["sum"] / t["count"] * 1000, 2) if t["count"] else 0.0,
+                "p50_ms": round(_percentile(recent, 50) * 1000, 2),
+                "p99_ms": round(_percentile(recent, 99) * 1000, 2),
+                "max_ms": round(t["max"] * 1000, 2),
+            }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "timings": timings}
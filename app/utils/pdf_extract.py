@@ -0,0 +1,152 @@
+# app/utils/pdf_extract.py
+# Single PDF text extraction path used by ingestion and the tools endpoints.
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+from dotenv import load_dotenv
+from .text_cache import get_text_cache, file_sha256
+
+load_dotenv()
+# fitz (PyMuPDF) is by far the fastest; pdfplumber / pypdf remain available as fallbacks
+PDF_BACKEND = os.getenv("PDF_BACKEND", "fitz")
+# documents with at least this many pages are split into page ranges across a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+BACKENDS = ("fitz", "pdfplumber", "pypdf")
+
+_pool = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS)
+    return _pool
+
+def resolve_backend(backend: str = None) -> str:
+    """Return the requested backend, falling back to the next installed one."""
+    candidates = [backend or PDF_BACKEND] + [b for b in BACKENDS if b != (backend or PDF_BACKEND)]
+    for name in candidates:
+        try:
+            if name == "fitz":
+                import fitz  # noqa: F401
+            elif name == "pdfplumber":
+                import pdfplumber  # noqa: F401
+            elif name == "pypdf":
+                import pypdf  # noqa: F401
+            else:
+                continue
+            return name
+        except ImportError:
+            continue
+    raise RuntimeError("No PDF backend installed (PyMuPDF, pdfplumber or pypdf required)")
+
+def page_count(path: str, backend: str = None) -> int:
+    backend = resolve_backend(backend)
+    if backend == "fitz":
+        import fitz
+        with fitz.open(path) as doc:
+            return doc.page_count
+    if backend == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    import pypdf
+    return len(pypdf.PdfReader(path).pages)
+
+def extract_page_range(path: str, start: int, stop: int, backend: str = None) -> List[str]:
+    # text of pages [start, stop) (0-based); top-level so it can run in a worker process
+    backend = resolve_backend(backend)
+    if backend == "fitz":
+        import fitz
+        with fitz.open(path) as doc:
+            return [doc.load_page(i).get_text() for i in range(start, min(stop, doc.page_count))]
+    if backend == "pdfplumber":
+        import pdfplumber
+        texts = []
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages[start:stop]:
+                texts.append(page.extract_text() or "")
+                page.flush_cache()
+        return texts
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    return [page.extract_text() or "" for page in reader.pages[start:stop]]
+
+def iter_pdf_pages(
+    path: str,
+    backend: str = None,
+    parallel: bool = None,
+    content_hash: str = None,
+    use_cache: bool = True,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order.
+    Text already extracted from a file with the same sha256 (content_hash, or
+    computed from the file) is served from the text cache without parsing;
+    otherwise pages are written to the cache as they are extracted.
+    """
+    backend = resolve_backend(backend)
+    cache = get_text_cache() if use_cache else None
+    if cache is None:
+        yield from _extract_pages(path, backend, parallel)
+        return
+    key = f"{content_hash or file_sha256(path)}-{backend}"
+    cached = cache.iter_pages(key)
+    if cached is not None:
+        for number, text in enumerate(cached, start=1):
+            yield number, text
+        return
+    writer = cache.writer(key)
+    try:
+        for number, text in _extract_pages(path, backend, parallel):
+            writer.add(text)
+            yield number, text
+    except BaseException:
+        writer.discard()
+        raise
+    writer.commit()
+
+def _extract_pages(path: str, backend: str, parallel: bool = None) -> Iterator[Tuple[int, str]]:
+    """
+    Extract pages without the cache, in page order.
+    Large documents are split into PDF_PAGES_PER_TASK ranges extracted by a
+    process pool; only a few ranges are in flight at once to bound memory.
+    """
+    total = page_count(path, backend)
+    if parallel is None:
+        parallel = total >= PDF_PARALLEL_MIN_PAGES and PDF_MAX_WORKERS > 1
+    ranges = [(s, min(s + PDF_PAGES_PER_TASK, total)) for s in range(0, total, PDF_PAGES_PER_TASK)]
+    if not parallel:
+        for start, stop in ranges:
+            for offset, text in enumerate(extract_page_range(path, start, stop, backend)):
+                yield start + offset + 1, text
+        return
+
+    pool = _get_pool()
+    window = PDF_MAX_WORKERS * 2
+    in_flight = []
+    next_range = 0
+    while next_range < len(ranges) or in_flight:
+        while next_range < len(ranges) and len(in_flight) < window:
+            start, stop = ranges[next_range]
+            in_flight.append((start, pool.submit(extract_page_range, path, start, stop, backend)))
+            next_range += 1
+        start, future = in_flight.pop(0)
+        for offset, text in enumerate(future.result()):
+            yield start + offset + 1, text
+
+def extract_pdf_pages(path: str, backend: str = None, content_hash: str = None) -> List[str]:
+    """Return the text of every page."""
+    return [text for _, text in iter_pdf_pages(path, backend, content_hash=content_hash)]
+
+async def extract_pdf_pages_async(path: str, backend: str = None, content_hash: str = None) -> List[str]:
+    """Same as extract_pdf_pages, run in a worker thread so the event loop is not blocked."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, extract_pdf_pages, path, backend, content_hash)
+
+async def extract_pdf_text_async(path: str, backend: str = None, content_hash: str = None) -> str:
+    pages = await extract_pdf_pages_async(path, backend, content_hash)
+    return "\n".join(pages)
@@ -1,11 +1,51 @@
 # app/utils/qdrant_client.py
-from qdrant_client import QdrantClient
+# Qdrant server backend of app/utils/vector_store.py
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http import models as qmodels
+import httpx
 import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
+from .vector_store import SearchTuning, COLLECTION_EXISTS_TTL_SECONDS
 load_dotenv()
 
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# keep-alive connection pool shared by every request on the async (query) path
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "64"))
+# index / quantization profile of new collections (see COLLECTION_PROFILES); searches use the
+# profile each collection was built with
+COLLECTION_PROFILE = os.getenv("COLLECTION_PROFILE", "default")
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    m: int = 16  # HNSW graph degree
+    ef_construct: int = 100  # HNSW build-time candidate list
+    quantization: Optional[str] = None  # None | "scalar" (int8, 4x smaller) | "binary" (1 bit, 32x smaller)
+    on_disk: bool = False  # original vectors memory-mapped from disk; quantized copies stay in RAM
+    hnsw_ef: Optional[int] = None  # default search-time candidate list (None: Qdrant's default)
+    rescore: bool = True  # re-rank quantized candidates with the original vectors
+    oversampling: float = 1.0  # quantized candidates fetched per requested result before rescoring
+
+# pick one for a corpus with benchmarks/bench_collection_profiles.py
+COLLECTION_PROFILES = {
+    # full-precision vectors in RAM: best recall, most memory
+    "default": CollectionProfile(),
+    "accurate": CollectionProfile(m=32, ef_construct=256, hnsw_ef=256),
+    # int8 copies in RAM, originals on disk for rescoring: ~4x less RAM
+    "compact": CollectionProfile(quantization="scalar", on_disk=True, hnsw_ef=128, oversampling=2.0),
+    # 1-bit copies in RAM: fastest and smallest, only for high-dimensional embeddings (>= 768)
+    "binary": CollectionProfile(quantization="binary", on_disk=True, hnsw_ef=128, oversampling=3.0),
+}
+
+def get_profile(name: str = None) -> CollectionProfile:
+    name = name or COLLECTION_PROFILE
+    if name not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile '{name}'. Use one of {tuple(COLLECTION_PROFILES)}")
+    return COLLECTION_PROFILES[name]
 
 # Initialize Qdrant client with optional API key for cloud instances
 if QDRANT_API_KEY:
@@ -13,14 +53,213 @@ if QDRANT_API_KEY:
 else:
     qdrant = QdrantClient(url=QDRANT_URL)
 
-def ensure_collection(collection_name: str, vector_size: int):
-    # create collection if not exists (simple config)
+# Async client for the query path, so searches never block the event loop
+async_qdrant = AsyncQdrantClient(
+    url=QDRANT_URL,
+    api_key=QDRANT_API_KEY,
+    limits=httpx.Limits(max_connections=QDRANT_POOL_SIZE, max_keepalive_connections=QDRANT_POOL_SIZE),
+)
+
+def resolve_alias(alias_name: str):
+    # physical collection an alias points to, or None if no such alias exists
+    for alias in qdrant.get_aliases().aliases:
+        if alias.alias_name == alias_name:
+            return alias.collection_name
+    return None
+
+def _quantization_config(profile: CollectionProfile):
+    if profile.quantization == "scalar":
+        return qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile.quantization == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def create_physical_collection(collection_name: str, vector_size: int, multitenant: bool = False, profile: str = None):
+    settings = get_profile(profile)
+    if multitenant:
+        # shared collection: HNSW graphs are built per tenant (payload_m) instead of one global graph
+        hnsw_config = qmodels.HnswConfigDiff(payload_m=settings.m, m=0, ef_construct=settings.ef_construct)
+    else:
+        hnsw_config = qmodels.HnswConfigDiff(m=settings.m, ef_construct=settings.ef_construct)
+    qdrant.create_collection(
+        collection_name=collection_name,
+        vectors_config=qmodels.VectorParams(size=vector_size, distance=qmodels.Distance.COSINE, on_disk=settings.on_disk),
+        hnsw_config=hnsw_config,
+        quantization_config=_quantization_config(settings),
+    )
+    remember_profile(collection_name, settings)
+    if not multitenant:
+        return
+    # the owner index is marked as the tenant key so Qdrant co-locates each tenant's points
+    qdrant.create_payload_index(
+        collection_name=collection_name,
+        field_name="owner",
+        field_schema=qmodels.KeywordIndexParams(type="keyword", is_tenant=True),
+    )
+    qdrant.create_payload_index(collection_name=collection_name, field_name="doc_id", field_schema="integer")
+
+_profiles = {}  # collection or alias name -> (profile it was built with, when that was learnt)
+_profiles_lock = threading.Lock()
+
+def remember_profile(collection_name: str, profile: CollectionProfile):
+    with _profiles_lock:
+        _profiles[collection_name] = (profile, time.monotonic())
+
+def forget_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+def _known_profile(collection_name: str) -> Optional[CollectionProfile]:
+    # other processes may re-point aliases, so learnt profiles expire like the existence memo
+    with _profiles_lock:
+        entry = _profiles.get(collection_name)
+    if entry is not None and time.monotonic() - entry[1] < COLLECTION_EXISTS_TTL_SECONDS:
+        return entry[0]
+    return None
+
+def _match_profile(config) -> CollectionProfile:
+    """The profile whose settings a collection was created with (read back from its config)."""
+    quantization = config.quantization_config
+    if isinstance(quantization, qmodels.ScalarQuantization):
+        kind = "scalar"
+    elif isinstance(quantization, qmodels.BinaryQuantization):
+        kind = "binary"
+    else:
+        kind = None
+    hnsw = config.hnsw_config
+    m = hnsw.m or hnsw.payload_m  # shared collections build per-tenant graphs only
+    candidates = [p for p in COLLECTION_PROFILES.values() if p.quantization == kind]
+    for profile in candidates:
+        if profile.m == m and profile.ef_construct == hnsw.ef_construct:
+            return profile
+    # built with a profile that was changed or removed since: closest by quantization
+    return candidates[0] if candidates else get_profile()
+
+def _physical_name(aliases, collection_name: str) -> str:
+    for alias in aliases:
+        if alias.alias_name == collection_name:
+            return alias.collection_name
+    return collection_name
+
+def collection_profile(collection_name: str) -> CollectionProfile:
+    profile = _known_profile(collection_name)
+    if profile is None:
+        try:
+            physical = _physical_name(qdrant.get_aliases().aliases, collection_name)
+            profile = _match_profile(qdrant.get_collection(physical).config)
+        except Exception as e:
+            print(f"Could not read the profile of {collection_name}, searching with '{COLLECTION_PROFILE}': {e}")
+            return get_profile()
+        remember_profile(collection_name, profile)
+    return profile
+
+async def collection_profile_async(collection_name: str) -> CollectionProfile:
+    profile = _known_profile(collection_name)
+    if profile is None:
+        try:
+            physical = _physical_name((await async_qdrant.get_aliases()).aliases, collection_name)
+            profile = _match_profile((await async_qdrant.get_collection(physical)).config)
+        except Exception as e:
+            print(f"Could not read the profile of {collection_name}, searching with '{COLLECTION_PROFILE}': {e}")
+            return get_profile()
+        remember_profile(collection_name, profile)
+    return profile
+
+def search_params(profile: CollectionProfile, tuning: SearchTuning = None):
+    # per-query settings: explicit tuning over the defaults of the profile the collection was built with
+    # (quantization settings are ignored by Qdrant for collections without quantization)
+    tuning = tuning or SearchTuning()
+    hnsw_ef = tuning.hnsw_ef if tuning.hnsw_ef is not None else profile.hnsw_ef
+    rescore = tuning.rescore if tuning.rescore is not None else profile.rescore
+    oversampling = tuning.oversampling if tuning.oversampling is not None else profile.oversampling
+    return qmodels.SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=qmodels.QuantizationSearchParams(rescore=rescore, oversampling=oversampling),
+    )
+
+def owner_filter(owner: str = None):
+    # restrict a query to one tenant's points (None: no restriction)
+    if owner is None:
+        return None
+    return qmodels.Filter(must=[qmodels.FieldCondition(key="owner", match=qmodels.MatchValue(value=owner))])
+
+def swap_alias(alias_name: str, collection_name: str):
+    """
+    Point an alias at a collection in one atomic alias update. A legacy
+    collection still using the logical name must already be copied into
+    collection_name: Qdrant cannot hold an alias and a collection under one
+    name, so the legacy collection is dropped right before the alias is
+    created. If that is interrupted, VectorStore.ensure_collection re-points
+    the alias at the newest version (the copy).
+    """
+    create = qmodels.CreateAliasOperation(
+        create_alias=qmodels.CreateAlias(collection_name=collection_name, alias_name=alias_name)
+    )
+    if resolve_alias(alias_name) is not None:
+        delete = qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias_name))
+        qdrant.update_collection_aliases(change_aliases_operations=[delete, create])
+    elif qdrant.collection_exists(alias_name):
+        qdrant.delete_collection(collection_name=alias_name)
+        for attempt in range(3):
+            try:
+                qdrant.update_collection_aliases(change_aliases_operations=[create])
+                break
+            except Exception as e:
+                if attempt == 2:
+                    raise RuntimeError(
+                        f"{alias_name} was dropped but the alias onto {collection_name} could not be created; "
+                        f"it is restored by the next ensure_collection({alias_name!r})"
+                    ) from e
+                time.sleep(0.5 * (attempt + 1))
+    else:
+        qdrant.update_collection_aliases(change_aliases_operations=[create])
+    with _profiles_lock:
+        _profiles.pop(alias_name, None)  # learnt again from the new target on the next search
+
+def delete_doc_points(collection_name: str, doc_id: int):
+    # remove every point belonging to a document (no-op if the collection is missing)
     try:
-        # Try to get the collection info to check if it exists
-        qdrant.get_collection(collection_name=collection_name)
-    except Exception:
-        # Collection doesn't exist, create it
-        qdrant.create_collection(
+        qdrant.delete(
+            collection_name=collection_name,
+            points_selector=qmodels.FilterSelector(
+                filter=qmodels.Filter(
+                    must=[qmodels.FieldCondition(key="doc_id", match=qmodels.MatchValue(value=doc_id))]
+                )
+            ),
+        )
+    except Exception as e:
+        print(f"Could not delete points for doc {doc_id} in {collection_name}: {e}")
+
+def retrieve_vectors(collection_name: str, point_ids, batch_size: int = 256) -> dict:
+    # fetch stored vectors by point id -> {point_id: vector}; missing points are skipped
+    vectors = {}
+    point_ids = list(point_ids)
+    for i in range(0, len(point_ids), batch_size):
+        records = qdrant.retrieve(
+            collection_name=collection_name,
+            ids=point_ids[i:i + batch_size],
+            with_vectors=True,
+            with_payload=False,
+        )
+        for record in records:
+            vectors[str(record.id)] = record.vector
+    return vectors
+
+def scroll_points(collection_name: str, batch_size: int = 256, owner: str = None):
+    # yield batches of {"id", "vector", "payload"} for every point (optionally one tenant's)
+    offset = None
+    while True:
+        records, offset = qdrant.scroll(
             collection_name=collection_name,
-            vectors_config={"size": vector_size, "distance": "Cosine"}
+            scroll_filter=owner_filter(owner),
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
         )
+        if records:
+            yield [{"id": str(r.id), "vector": r.vector, "payload": r.payload or {}} for r in records]
+        if offset is None:
+            break
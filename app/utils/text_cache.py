@@ -0,0 +1,137 @@
+# app/utils/text_cache.py
+# Content-addressed cache of extracted PDF text (one gzip'd JSON line per page), keyed by file sha256.
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import threading
+from typing import Iterator, List, Optional
+from dotenv import load_dotenv
+from . import metrics
+
+load_dotenv()
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join(CACHE_DIR, "text"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+class _PageWriter:
+    """Streams pages into a temporary cache file; published atomically on success."""
+
+    def __init__(self, cache: "TextCache", key: str):
+        self.cache = cache
+        self.final_path = cache._path(key)
+        os.makedirs(os.path.dirname(self.final_path), exist_ok=True)
+        self.tmp_path = f"{self.final_path}.{uuid.uuid4().hex}.tmp"
+        self._file = gzip.open(self.tmp_path, "wt", encoding="utf-8")
+
+    def add(self, text: str):
+        self._file.write(json.dumps(text) + "\n")
+
+    def commit(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.final_path)
+        self.cache._added(os.path.getsize(self.final_path))
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except OSError:
+            pass
+
+class TextCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.jsonl.gz")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".jsonl.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def iter_pages(self, key: str) -> Optional[Iterator[str]]:
+        """Return an iterator over cached page texts, or None on a miss."""
+        path = self._path(key)
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            metrics.incr("text_cache.misses")
+            return None
+        metrics.incr("text_cache.hits")
+
+        try:
+            # opened eagerly so a concurrent eviction cannot pull the file away mid-read
+            handle = gzip.open(path, "rt", encoding="utf-8")
+        except OSError:
+            return None
+
+        def read():
+            with handle:
+                for line in handle:
+                    yield json.loads(line)
+        return read()
+
+    def get_pages(self, key: str) -> Optional[List[str]]:
+        pages = self.iter_pages(key)
+        return list(pages) if pages is not None else None
+
+    def writer(self, key: str) -> _PageWriter:
+        return _PageWriter(self, key)
+
+    def _added(self, size: int):
+        with self._lock:
+            self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+        metrics.set_gauge("text_cache.bytes", self._total)
+
+    def _evict(self):
+        # evict least recently used files down to 90% of the budget
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.unlink(path)
+                self._total -= size
+                metrics.incr("text_cache.evictions")
+            except OSError:
+                pass
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_text_cache() -> Optional[TextCache]:
+    """Return the process-wide text cache (None when disabled)."""
+    global _cache
+    if not TEXT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TextCache(TEXT_CACHE_DIR, TEXT_CACHE_MAX_BYTES)
+        return _cache
@@ -0,0 +1,74 @@
+# app/utils/uploads.py
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+# uploads are copied in fixed-size blocks so memory stays flat regardless of file size
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+@dataclass
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+
+async def save_upload_to_disk(
+    upload: UploadFile,
+    dest_path: str,
+    max_bytes: int = None,
+    block_size: int = None,
+) -> StoredUpload:
+    """
+    Stream an UploadFile to disk block by block, hashing it on the fly.
+    Args:
+        upload (UploadFile): Incoming file.
+        dest_path (str): Where to write it.
+        max_bytes (int, optional): Size limit (defaults to MAX_UPLOAD_BYTES).
+        block_size (int, optional): Copy block size (defaults to UPLOAD_BLOCK_SIZE).
+    Returns:
+        StoredUpload: Path, size in bytes and sha256 hex digest of the stored file.
+    Raises:
+        HTTPException: 413 if the file exceeds the size limit (partial file is removed).
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    block_size = block_size or UPLOAD_BLOCK_SIZE
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                block = await upload.read(block_size)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum allowed size is {max_bytes // (1024 * 1024)} MB",
+                    )
+                digest.update(block)
+                await run_in_threadpool(out.write, block)
+    except BaseException:
+        try:
+            os.unlink(dest_path)
+        except OSError:
+            pass
+        raise
+    return StoredUpload(path=dest_path, size=size, sha256=digest.hexdigest())
+
+async def save_upload_to_tempfile(upload: UploadFile, suffix: str = "", max_bytes: int = None) -> StoredUpload:
+    """Stream an UploadFile into a new temporary file; the caller removes it."""
+    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return await save_upload_to_disk(upload, tmp_path, max_bytes=max_bytes)
+
+def remove_file(path: str):
+    # best-effort cleanup of temporary uploads
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,249 @@
+# app/utils/vector_store.py
+# Backend-neutral vector store interface: Qdrant (server) or an embedded in-process index.
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+# qdrant: Qdrant server (QDRANT_URL); local: memory-mapped NumPy index under LOCAL_VECTOR_DIR
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+VECTOR_BACKENDS = ("qdrant", "local")
+# how long ensure_collection trusts that a collection it has seen still exists
+# (deletes made through this process forget it immediately)
+COLLECTION_EXISTS_TTL_SECONDS = float(os.getenv("COLLECTION_EXISTS_TTL_SECONDS", "300"))
+
+def versioned_name(name: str, version: int) -> str:
+    return f"{name}_v{version}"
+
+@dataclass(frozen=True)
+class SearchTuning:
+    """Per-query accuracy / latency knobs of approximate backends (None: the collection profile's default)."""
+    hnsw_ef: Optional[int] = None  # graph candidates explored per query
+    rescore: Optional[bool] = None  # re-rank quantized candidates with the original vectors
+    oversampling: Optional[float] = None  # quantized candidates fetched per result before rescoring
+
+class VectorStore:
+    """
+    Operations the services need from a vector database. Collections are
+    addressed by logical names that are aliases onto versioned physical
+    collections (name_v1, name_v2, ...), see ensure_collection / swap_alias.
+    Points are dicts {"id", "vector", "payload"}; search hits expose
+    .id, .score and .payload. Distance is cosine.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._known_lock = threading.Lock()
+        self._known = {}  # logical collection name -> when it was last seen to exist
+
+    def collection_exists(self, collection_name: str) -> bool:
+        raise NotImplementedError
+
+    def list_collections(self) -> List[str]:
+        raise NotImplementedError
+
+    def create_physical_collection(self, collection_name: str, vector_size: int, multitenant: bool = False,
+                                   profile: str = None):
+        """
+        multitenant: shared collection searched per owner (payload-indexed owner / doc_id).
+        profile: index / quantization profile of approximate backends (default COLLECTION_PROFILE).
+        """
+        raise NotImplementedError
+
+    def delete_collection(self, collection_name: str):
+        raise NotImplementedError
+
+    def resolve_alias(self, alias_name: str):
+        """Physical collection an alias points to, or None if no such alias exists."""
+        raise NotImplementedError
+
+    def swap_alias(self, alias_name: str, collection_name: str):
+        """Point an alias at a collection in one atomic update."""
+        raise NotImplementedError
+
+    def upsert(self, collection_name: str, points: List[dict], wait: bool = True):
+        raise NotImplementedError
+
+    def search(self, collection_name: str, vector: List[float], limit: int = 5, owner: str = None,
+               tuning: SearchTuning = None):
+        """
+        Top `limit` points by cosine similarity; `owner` restricts the search to one
+        tenant's points. `tuning` is ignored by exact backends.
+        """
+        raise NotImplementedError
+
+    async def search_async(self, collection_name: str, vector: List[float], limit: int = 5, owner: str = None,
+                           tuning: SearchTuning = None):
+        return await asyncio.to_thread(self.search, collection_name, vector, limit, owner, tuning)
+
+    def search_batch(self, collection_name: str, vectors: List[List[float]], limit: int = 5, owner: str = None,
+                     tuning: SearchTuning = None) -> list:
+        """One result list per query vector, in order."""
+        return [self.search(collection_name, vector, limit, owner, tuning) for vector in vectors]
+
+    async def search_batch_async(self, collection_name: str, vectors: List[List[float]], limit: int = 5,
+                                 owner: str = None, tuning: SearchTuning = None) -> list:
+        return await asyncio.to_thread(self.search_batch, collection_name, vectors, limit, owner, tuning)
+
+    def iter_points(self, collection_name: str, batch_size: int = 256, owner: str = None) -> Iterator[List[dict]]:
+        """Batches of stored points ({"id", "vector", "payload"}), optionally only one tenant's."""
+        raise NotImplementedError
+
+    def count_points(self, collection_name: str, owner: str = None) -> int:
+        """Exact number of points in a collection (optionally one tenant's)."""
+        raise NotImplementedError
+
+    def delete_doc_points(self, collection_name: str, doc_id: int):
+        """Remove every point belonging to a document (no-op if the collection is missing)."""
+        raise NotImplementedError
+
+    def retrieve_vectors(self, collection_name: str, point_ids: Iterable[str], batch_size: int = 256) -> Dict[str, List[float]]:
+        """Fetch stored vectors by point id -> {point_id: vector}; missing points are skipped."""
+        raise NotImplementedError
+
+    def list_versions(self, name: str) -> List[int]:
+        # version numbers of the physical collections behind a logical collection name
+        prefix = f"{name}_v"
+        versions = []
+        for collection in self.list_collections():
+            suffix = collection[len(prefix):]
+            if collection.startswith(prefix) and suffix.isdigit():
+                versions.append(int(suffix))
+        return sorted(versions)
+
+    def ensure_collection(self, collection_name: str, vector_size: int, multitenant: bool = False,
+                          profile: str = None):
+        # collection_name is a logical name: an alias onto a versioned physical collection
+        # (legacy per-user collections created before versioning are used as they are)
+        with self._known_lock:
+            seen = self._known.get(collection_name)
+        if seen is not None and time.monotonic() - seen < COLLECTION_EXISTS_TTL_SECONDS:
+            return
+        if self.resolve_alias(collection_name) is None and not self.collection_exists(collection_name):
+            # versions without an alias: a legacy collection was dropped but its alias never created
+            # (see swap_alias); the newest version is the copy that replaced it
+            versions = self.list_versions(collection_name)
+            physical = versioned_name(collection_name, versions[-1] if versions else 1)
+            if not versions:
+                self.create_physical_collection(physical, vector_size, multitenant=multitenant, profile=profile)
+            self.swap_alias(collection_name, physical)
+        with self._known_lock:
+            self._known[collection_name] = time.monotonic()
+
+    def forget_collections(self):
+        """Drop memoized existence checks (called after a collection is deleted)."""
+        with self._known_lock:
+            self._known.clear()
+
+class QdrantStore(VectorStore):
+    """Qdrant server backend (sync client for writes, pooled async client for queries)."""
+
+    name = "qdrant"
+
+    def __init__(self):
+        super().__init__()
+        from . import qdrant_client as backend
+        self._backend = backend
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return self._backend.qdrant.collection_exists(collection_name)
+
+    def list_collections(self) -> List[str]:
+        return [c.name for c in self._backend.qdrant.get_collections().collections]
+
+    def create_physical_collection(self, collection_name: str, vector_size: int, multitenant: bool = False,
+                                   profile: str = None):
+        self._backend.create_physical_collection(collection_name, vector_size, multitenant=multitenant, profile=profile)
+
+    def delete_collection(self, collection_name: str):
+        self._backend.qdrant.delete_collection(collection_name=collection_name)
+        self.forget_collections()
+        self._backend.forget_profiles()
+
+    def resolve_alias(self, alias_name: str):
+        return self._backend.resolve_alias(alias_name)
+
+    def swap_alias(self, alias_name: str, collection_name: str):
+        self._backend.swap_alias(alias_name, collection_name)
+
+    def upsert(self, collection_name: str, points: List[dict], wait: bool = True):
+        self._backend.qdrant.upsert(collection_name=collection_name, points=points, wait=wait)
+
+    def search(self, collection_name: str, vector: List[float], limit: int = 5, owner: str = None,
+               tuning: SearchTuning = None):
+        profile = self._backend.collection_profile(collection_name)
+        return self._backend.qdrant.search(
+            collection_name=collection_name, query_vector=vector, limit=limit,
+            query_filter=self._backend.owner_filter(owner), search_params=self._backend.search_params(profile, tuning),
+        )
+
+    async def search_async(self, collection_name: str, vector: List[float], limit: int = 5, owner: str = None,
+                           tuning: SearchTuning = None):
+        profile = await self._backend.collection_profile_async(collection_name)
+        return await self._backend.async_qdrant.search(
+            collection_name=collection_name, query_vector=vector, limit=limit,
+            query_filter=self._backend.owner_filter(owner), search_params=self._backend.search_params(profile, tuning),
+        )
+
+    def search_batch(self, collection_name: str, vectors: List[List[float]], limit: int = 5, owner: str = None,
+                     tuning: SearchTuning = None) -> list:
+        profile = self._backend.collection_profile(collection_name)
+        return self._backend.qdrant.search_batch(
+            collection_name=collection_name, requests=self._batch_requests(vectors, limit, owner, profile, tuning)
+        )
+
+    async def search_batch_async(self, collection_name: str, vectors: List[List[float]], limit: int = 5,
+                                 owner: str = None, tuning: SearchTuning = None) -> list:
+        profile = await self._backend.collection_profile_async(collection_name)
+        return await self._backend.async_qdrant.search_batch(
+            collection_name=collection_name, requests=self._batch_requests(vectors, limit, owner, profile, tuning)
+        )
+
+    def _batch_requests(self, vectors: List[List[float]], limit: int, owner: str, profile,
+                        tuning: SearchTuning = None) -> list:
+        query_filter = self._backend.owner_filter(owner)
+        params = self._backend.search_params(profile, tuning)
+        return [
+            self._backend.qmodels.SearchRequest(
+                vector=vector, limit=limit, filter=query_filter, params=params, with_payload=True
+            )
+            for vector in vectors
+        ]
+
+    def iter_points(self, collection_name: str, batch_size: int = 256, owner: str = None) -> Iterator[List[dict]]:
+        return self._backend.scroll_points(collection_name, batch_size, owner)
+
+    def count_points(self, collection_name: str, owner: str = None) -> int:
+        return self._backend.qdrant.count(
+            collection_name=collection_name, count_filter=self._backend.owner_filter(owner), exact=True
+        ).count
+
+    def delete_doc_points(self, collection_name: str, doc_id: int):
+        self._backend.delete_doc_points(collection_name, doc_id)
+
+    def retrieve_vectors(self, collection_name: str, point_ids: Iterable[str], batch_size: int = 256) -> Dict[str, List[float]]:
+        return self._backend.retrieve_vectors(collection_name, point_ids, batch_size)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_vector_store(backend: str = None) -> VectorStore:
+    """Return the process-wide store for a backend (default VECTOR_BACKEND)."""
+    backend = backend or VECTOR_BACKEND
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend '{backend}'. Use one of {VECTOR_BACKENDS}")
+    with _stores_lock:
+        store = _stores.get(backend)
+        if store is None:
+            if backend == "local":
+                from .local_vector_store import LocalVectorStore
+                store = LocalVectorStore()
+            else:
+                store = QdrantStore()
+            _stores[backend] = store
+        return store
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Recall@k versus search latency of each Qdrant collection profile (see
+COLLECTION_PROFILES in app/utils/qdrant_client.py), swept over the per-query
+hnsw_ef and rescore settings, to pick a profile for a corpus size.
+
+Usage (from the repository root; needs QDRANT_URL):
+    python -m benchmarks.bench_collection_profiles --size 100000 --dim 768
+    python -m benchmarks.bench_collection_profiles --collection user_mvp_user   # real embeddings
+
+Recall is measured against an exact NumPy cosine search over the same vectors.
+Queries are held-out vectors (with a little noise), never indexed themselves.
+Collections are created as bench_profile_<name> and deleted afterwards.
+"""
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from app.utils.qdrant_client import COLLECTION_PROFILES, qdrant
+from app.utils.vector_store import SearchTuning, get_vector_store
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+def synthetic(size: int, dim: int, rng) -> np.ndarray:
+    # clustered data: embedding corpora are far from uniform, which matters for HNSW recall
+    centers = rng.standard_normal((max(1, size // 500), dim), dtype=np.float32)
+    labels = rng.integers(0, len(centers), size=size)
+    return centers[labels] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+
+def from_collection(store, name: str, size: int) -> np.ndarray:
+    vectors = []
+    for batch in store.iter_points(name, 1024):
+        vectors.extend(point["vector"] for point in batch)
+        if len(vectors) >= size:
+            break
+    return np.asarray(vectors[:size], dtype=np.float32)
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> list:
+    data = data / np.linalg.norm(data, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = []
+    for start in range(0, len(queries), 64):
+        scores = queries[start:start + 64] @ data.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth.extend(set(row) for row in top)
+    return truth
+
+def wait_until_indexed(name: str, timeout: float = 1800):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        info = qdrant.get_collection(name)
+        if str(info.status).lower().endswith("green"):
+            return time.perf_counter() - started
+        time.sleep(1)
+    raise TimeoutError(f"{name} not indexed after {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--collection", default=None, help="sample vectors from this collection instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", default=list(COLLECTION_PROFILES), choices=list(COLLECTION_PROFILES))
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    args = parser.parse_args()
+
+    store = get_vector_store("qdrant")
+    rng = np.random.default_rng(0)
+    if args.collection:
+        vectors = from_collection(store, args.collection, args.size + args.queries)
+    else:
+        vectors = synthetic(args.size + args.queries, args.dim, rng)
+    data, held_out = vectors[:-args.queries], vectors[-args.queries:]
+    queries = held_out + 0.05 * rng.standard_normal(held_out.shape, dtype=np.float32)
+    truth = exact_top_k(data, queries, args.top_k)
+    ids = [str(uuid.uuid4()) for _ in range(len(data))]
+    row_of = {point_id: row for row, point_id in enumerate(ids)}
+
+    print(f"{len(data)} vectors, dim {data.shape[1]}, {len(queries)} queries, recall@{args.top_k}")
+    print(f"{'profile':>9}{'index s':>9}{'hnsw_ef':>9}{'rescore':>9}{'recall':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for profile in args.profiles:
+        name = f"bench_profile_{profile}"
+        store.create_physical_collection(name, data.shape[1], profile=profile)
+        try:
+            started = time.perf_counter()
+            for start in range(0, len(data), 512):
+                store.upsert(name, [
+                    {"id": ids[start + i], "vector": v.tolist(), "payload": {}}
+                    for i, v in enumerate(data[start:start + 512])
+                ], wait=True)
+            index_seconds = time.perf_counter() - started + wait_until_indexed(name)
+            rescores = [True, False] if COLLECTION_PROFILES[profile].quantization else [None]
+            for ef in args.ef:
+                for rescore in rescores:
+                    tuning = SearchTuning(hnsw_ef=ef, rescore=rescore)
+                    store.search(name, queries[0].tolist(), args.top_k, tuning=tuning)  # warm-up
+                    latencies = []
+                    found = 0
+                    for query, expected in zip(queries, truth):
+                        started = time.perf_counter()
+                        hits = store.search(name, query.tolist(), args.top_k, tuning=tuning)
+                        latencies.append(time.perf_counter() - started)
+                        found += len(expected & {row_of[str(hit.id)] for hit in hits})
+                    recall = found / (len(queries) * args.top_k)
+                    label = "-" if rescore is None else ("yes" if rescore else "no")
+                    print(f"{profile:>9}{index_seconds:>9.1f}{ef:>9}{label:>9}{recall:>8.3f}"
+                          f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 99) * 1000:>9.2f}")
+        finally:
+            store.delete_collection(name)
+
+if __name__ == "__main__":
+    main()
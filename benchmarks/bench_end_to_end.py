@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingest and query throughput with no external services: the fake
+LLM provider (LLM_PROVIDER=fake, see app/utils/llm_provider.py) stands in for
+Gemini and the local vector backend for Qdrant, so the whole pipeline (chunking,
+embedding, indexing, retrieval, prompt building, generation) runs on a laptop.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_end_to_end --docs 20 --pages 30 --queries 200 --concurrency 1 8 32
+    FAKE_LLM_LATENCY=lognormal:900,0.5 FAKE_EMBED_LATENCY=fixed:80 python -m benchmarks.bench_end_to_end
+
+Synthetic documents are generated from a fixed seed. The database, uploads,
+vector store, lexical index and caches all live in a temporary directory that
+is removed afterwards. Latencies include the simulated model latency, so the
+numbers show how the service behaves around a model of that speed (queueing in
+the LLM scheduler, overlap of the pipeline stages), not how fast Gemini is.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# must be set before the app modules read their configuration
+WORKDIR = tempfile.mkdtemp(prefix="bench_e2e_")
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'rag.db')}"
+for name, sub in (("LOCAL_VECTOR_DIR", "vector_store"), ("LEXICAL_INDEX_DIR", "lexical_index"),
+                  ("CACHE_DIR", "cache"), ("UPLOAD_DIR", "uploads")):
+    os.environ[name] = os.path.join(WORKDIR, sub)
+os.environ.setdefault("LLM_DEFAULT_RPM", "0")  # measure the service, not a quota
+
+from app.models import models  # noqa: E402
+from app.models.db import Base, SessionLocal, engine  # noqa: E402
+from app.services.document_service import UPLOAD_DIR, process_document, register_document  # noqa: E402
+from app.services.rag_service import answer_query  # noqa: E402
+from app.utils import metrics  # noqa: E402
+
+OWNER = "bench_user"
+TOPICS = ["bail", "appeal", "contract", "tenancy", "deposit", "injunction", "evidence", "witness",
+          "arbitration", "damages", "custody", "property", "licence", "fraud", "negligence", "notice"]
+FILLER = ["the", "court", "held", "that", "party", "under", "section", "order", "case", "claim",
+          "filed", "dated", "said", "shall", "petition", "respondent", "applicant", "hearing",
+          "judgment", "record", "relief", "counsel", "submitted", "statement", "within", "days"]
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+def write_documents(count: int, pages: int, words_per_page: int, rng: random.Random) -> list:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    paths = []
+    for d in range(count):
+        topics = rng.sample(TOPICS, 3)
+        text = []
+        for _ in range(pages):
+            words = [rng.choice(topics) if rng.random() < 0.15 else rng.choice(FILLER) for _ in range(words_per_page)]
+            text.append(" ".join(words) + ".\n\n")
+        path = os.path.join(UPLOAD_DIR, f"doc_{d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(text))
+        paths.append(path)
+    return paths
+
+def ingest_one(path: str) -> int:
+    db = SessionLocal()
+    try:
+        doc = register_document(path, os.path.basename(path), db, owner=OWNER)
+        return process_document(doc, db)
+    finally:
+        db.close()
+
+def ingest(paths: list, workers: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunks = sum(pool.map(ingest_one, paths))
+    wall = time.perf_counter() - started
+    return {"docs": len(paths), "chunks": chunks, "seconds": wall,
+            "docs_per_sec": len(paths) / wall, "chunks_per_sec": chunks / wall}
+
+async def query_load(total: int, concurrency: int, rng: random.Random, offset: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        # unique questions, so neither the answer cache nor single-flight hides the work
+        query = f"what does the record say about {rng.choice(TOPICS)} and {rng.choice(TOPICS)} ({offset + i})"
+        async with semaphore:
+            started = time.perf_counter()
+            await answer_query(query, owner=OWNER)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - started
+    return {"p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000,
+            "rps": total / wall}
+
+async def queries(total: int, levels: list, rng: random.Random):
+    print(f"{'concurrency':>12}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for n, concurrency in enumerate(levels):
+        result = await query_load(total, concurrency, rng, n * total)
+        print(f"{concurrency:>12}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['rps']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--ingest-workers", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        Base.metadata.create_all(bind=engine)
+        rng = random.Random(args.seed)
+        paths = write_documents(args.docs, args.pages, args.words_per_page, rng)
+        result = ingest(paths, args.ingest_workers)
+        print(f"ingest: {result['docs']} docs, {result['chunks']} chunks in {result['seconds']:.1f}s "
+              f"({result['docs_per_sec']:.2f} docs/s, {result['chunks_per_sec']:.0f} chunks/s)")
+        asyncio.run(queries(args.queries, args.concurrency, rng))
+        llm = {name: t for name, t in metrics.snapshot()["timings"].items() if name.startswith("llm.")}
+        for name, t in sorted(llm.items()):
+            print(f"  {name:<40} n={t['count']:<7} p50 {t['p50_ms']:>8.1f} ms  p99 {t['p99_ms']:>8.1f} ms")
+    finally:
+        engine.dispose()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
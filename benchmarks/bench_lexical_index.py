@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+BM25 lexical index: build throughput, on-disk size, query latency and hit rate
+on identifier-style queries ("CR/CCPS/593/2025", "Section 66A").
+
+Synthetic corpus (no services needed), from the repository root:
+    python -m benchmarks.bench_lexical_index --chunks 10000 50000
+
+Against a real tenant (Qdrant, database and Gemini key configured), comparing
+vector-only and hybrid retrieval on identifiers sampled from the stored chunks:
+    python -m benchmarks.bench_lexical_index --owner mvp_user --samples 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+from app.services.lexical_index import LexicalIndex
+
+WORDS = (
+    "court accused bail petition order hearing evidence witness police complaint judgment appeal "
+    "prosecution respondent petitioner magistrate custody investigation offence charge sheet trial "
+    "statement cognizable warrant arrest remand section act code penal procedure tribunal"
+).split()
+CASE_NUMBER = re.compile(r"\b[A-Z]{2,}(?:/[A-Z0-9]+){2,}\b")
+PROVISION = re.compile(r"\b(?:Section|Sec\.|Article|Rule)\s*\d+[A-Z]?\b")
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+def synthetic_chunk(i: int, rng: random.Random) -> dict:
+    words = rng.choices(WORDS, k=140)
+    # every chunk carries a unique case number and a (shared) statutory reference
+    words.insert(rng.randrange(len(words)), f"CR/CCPS/{i}/2025")
+    words.insert(rng.randrange(len(words)), f"Section {rng.randrange(1, 600)}{rng.choice(['', 'A', 'B'])}")
+    return {"id": f"p{i}", "doc_id": i // 200, "text": " ".join(words), "page": 1}
+
+def run_synthetic(sizes, queries: int, top_k: int):
+    print(f"{'chunks':>8}{'build/s':>10}{'MB':>8}{'p50 ms':>9}{'p99 ms':>9}{'hit@k':>8}")
+    for size in sizes:
+        rng = random.Random(size)
+        directory = tempfile.mkdtemp(prefix="bench_lexical_")
+        try:
+            index = LexicalIndex(os.path.join(directory, "bench.sqlite3"))
+            started = time.perf_counter()
+            for start in range(0, size, 1000):
+                index.add([synthetic_chunk(i, rng) for i in range(start, min(start + 1000, size))])
+            build_rate = size / (time.perf_counter() - started)
+
+            latencies = []
+            hits = 0
+            for _ in range(queries):
+                target = rng.randrange(size)
+                started = time.perf_counter()
+                results = index.search(f"what happened in case CR/CCPS/{target}/2025", top_k)
+                latencies.append(time.perf_counter() - started)
+                hits += any(hit["id"] == f"p{target}" for hit in results)
+            print(
+                f"{size:>8}{build_rate:>10.0f}{index.stats()['bytes'] / 1e6:>8.1f}"
+                f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 99) * 1000:>9.2f}"
+                f"{hits / queries:>8.0%}"
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+async def run_tenant(owner: str, samples: int, top_k: int):
+    from app.models import db as db_module
+    from app.models import models
+    from app.services.rag_service import search_chunks_async
+
+    db = db_module.SessionLocal()
+    try:
+        doc_ids = [d for (d,) in db.query(models.Document.id).filter(models.Document.owner == owner)]
+        candidates = []
+        for row in db.query(models.Chunk).filter(models.Chunk.doc_id.in_(doc_ids)).yield_per(500):
+            for match in CASE_NUMBER.findall(row.text) + PROVISION.findall(row.text):
+                candidates.append((match, row.qdrant_point_id, row.doc_id))
+    finally:
+        db.close()
+    if not candidates:
+        print("No identifier-style tokens found in this tenant's chunks")
+        return
+    sample = random.Random(0).sample(candidates, min(samples, len(candidates)))
+
+    print(f"{'mode':<8}{'p50 ms':>9}{'p99 ms':>9}{'hit@k':>8}{'doc hit@k':>11}")
+    for mode in ("vector", "hybrid"):
+        latencies = []
+        chunk_hits = doc_hits = 0
+        for identifier, point_id, doc_id in sample:
+            started = time.perf_counter()
+            results = await search_chunks_async(identifier, top_k=top_k, owner=owner, mode=mode)
+            latencies.append(time.perf_counter() - started)
+            chunk_hits += any(hit["id"] == point_id for hit in results)
+            # identifiers repeat across chunks of a document, so also count any chunk of the right document
+            doc_hits += any(hit.get("doc_id") == doc_id for hit in results)
+        print(
+            f"{mode:<8}{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}"
+            f"{chunk_hits / len(sample):>8.0%}{doc_hits / len(sample):>11.0%}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--owner", default=None, help="benchmark a real tenant instead of a synthetic corpus")
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+    if args.owner:
+        asyncio.run(run_tenant(args.owner, args.samples, args.top_k))
+    else:
+        run_synthetic(args.chunks, args.queries, args.top_k)
+
+if __name__ == "__main__":
+    main()
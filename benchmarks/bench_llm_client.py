@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of the Gemini client layer: the old path (new GenerativeModel
+and a ChatML-wrapped prompt on every call) against the model registry (cached
+client per (model, system prompt), prompt passed as system_instruction).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_llm_client --calls 10000           # client setup only, offline
+    python -m benchmarks.bench_llm_client --live 20               # + real calls (needs GEMINIAI_API_KEY)
+
+The offline part times everything a call does before the request is sent.
+The live part alternates both paths on the same prompt and reports p50
+latency and the prompt tokens Gemini billed for each.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import google.generativeai as genai
+
+from app.tools.service import SYSTEM_PROMPT_LEGAL_GUIDE
+from app.utils.llm_provider import ModelRegistry, generation_config
+
+MODEL = "gemini-2.5-flash-lite"
+QUERY = "My landlord is refusing to return my security deposit after I moved out. What can I do?"
+
+def chatml(system_prompt: str, user_query: str) -> str:
+    # the prompt format get_LLM_Response used before the registry
+    return f"<|system|>\n{system_prompt}\n<|end|>\n<|user|>\n{user_query}\n<|end|>\n"
+
+def old_setup():
+    return genai.GenerativeModel(MODEL), chatml(SYSTEM_PROMPT_LEGAL_GUIDE, QUERY)
+
+def registry_setup(registry: ModelRegistry):
+    return registry.get(MODEL, SYSTEM_PROMPT_LEGAL_GUIDE), QUERY
+
+def time_setup(setup, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        setup()
+    return (time.perf_counter() - started) / calls
+
+async def live(rounds: int, registry: ModelRegistry):
+    results = {"old": ([], []), "registry": ([], [])}
+    config = generation_config(max_output_tokens=256, temperature=0.0)
+    for _ in range(rounds):
+        for name, setup in (("old", old_setup), ("registry", lambda: registry_setup(registry))):
+            started = time.perf_counter()
+            model, prompt = setup()
+            response = await model.generate_content_async(prompt, generation_config=config)
+            results[name][0].append(time.perf_counter() - started)
+            results[name][1].append(response.usage_metadata.prompt_token_count)
+    print(f"{'path':<10}{'p50 ms':>9}{'prompt tokens':>15}")
+    for name, (latencies, tokens) in results.items():
+        print(f"{name:<10}{statistics.median(latencies) * 1000:>9.1f}{statistics.median(tokens):>15.0f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--live", type=int, default=0, help="real calls per path")
+    args = parser.parse_args()
+
+    genai.configure(api_key=os.getenv("GEMINIAI_API_KEY"))
+    registry = ModelRegistry(max_entries=64)
+    old = time_setup(old_setup, args.calls)
+    cached = time_setup(lambda: registry_setup(registry), args.calls)
+    print(f"client setup per call: old {old * 1e6:.1f} us, registry {cached * 1e6:.1f} us "
+          f"({old / cached if cached else float('inf'):.0f}x less)")
+    if args.live:
+        asyncio.run(live(args.live, registry))
+
+if __name__ == "__main__":
+    main()
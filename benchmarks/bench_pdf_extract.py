@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Compare PDF text extraction backends on pages/sec and peak memory.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pdf_extract path/to/judgment.pdf [more.pdf ...]
+
+Every backend runs in its own child process so peak RSS is measured in isolation.
+"""
+
+import sys
+import time
+import resource
+import multiprocessing as mp
+
+from app.utils.pdf_extract import BACKENDS, iter_pdf_pages, resolve_backend
+
+def _run(path: str, backend: str, parallel: bool, out: mp.Queue):
+    try:
+        if resolve_backend(backend) != backend:
+            raise RuntimeError("backend not installed")
+        started = time.perf_counter()
+        pages = chars = 0
+        for _, text in iter_pdf_pages(path, backend=backend, parallel=parallel, use_cache=False):
+            pages += 1
+            chars += len(text)
+        elapsed = time.perf_counter() - started
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out.put({"pages": pages, "chars": chars, "seconds": elapsed, "peak_rss_mb": peak_kb / 1024})
+    except Exception as e:
+        out.put({"error": f"{type(e).__name__}: {e}"})
+
+def bench(path: str):
+    print(f"\n{path}")
+    print(f"{'backend':<22}{'pages':>7}{'seconds':>10}{'pages/sec':>12}{'peak RSS MB':>14}{'chars':>12}")
+    configs = [(b, False) for b in BACKENDS] + [("fitz", True)]
+    for backend, parallel in configs:
+        label = f"{backend}{' (parallel)' if parallel else ''}"
+        out = mp.Queue()
+        proc = mp.Process(target=_run, args=(path, backend, parallel, out))
+        proc.start()
+        result = out.get()
+        proc.join()
+        if "error" in result:
+            print(f"{label:<22}{result['error']}")
+            continue
+        rate = result["pages"] / result["seconds"] if result["seconds"] else float("inf")
+        print(
+            f"{label:<22}{result['pages']:>7}{result['seconds']:>10.2f}{rate:>12.1f}"
+            f"{result['peak_rss_mb']:>14.1f}{result['chars']:>12}"
+        )
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for pdf_path in sys.argv[1:]:
+        bench(pdf_path)
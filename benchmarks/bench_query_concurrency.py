@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Query-path latency under concurrency: blocking (sync embed + search) vs async.
+
+Usage (from the repository root, with Qdrant and the Gemini key configured):
+    python -m benchmarks.bench_query_concurrency --owner mvp_user --requests 64 --concurrency 1 8 32
+
+The "sync" mode calls retrieve_relevant_chunks inside coroutines the way
+answer_query used to, so every request blocks the event loop; "async" uses
+retrieve_relevant_chunks_async. Reports p50/p99 latency and throughput.
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.services.rag_service import retrieve_relevant_chunks, retrieve_relevant_chunks_async
+
+QUERIES = [
+    "what are the charges in this case",
+    "when was the FIR filed",
+    "was bail granted and on what conditions",
+    "which sections of the IT Act are invoked",
+    "who is the accused and what is the allegation",
+    "what is the current status of the case",
+]
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+async def run(mode: str, owner: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        query = f"{QUERIES[i % len(QUERIES)]} ({i})"  # unique text so the embedding cache is not hit
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "sync":
+                retrieve_relevant_chunks(query, owner=owner)
+            else:
+                await retrieve_relevant_chunks_async(query, owner=owner)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": total / wall,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--owner", default="mvp_user")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'concurrency':>12}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for concurrency in args.concurrency:
+        for mode in ("sync", "async"):
+            result = await run(mode, args.owner, args.requests, concurrency)
+            print(f"{mode:<8}{concurrency:>12}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['rps']:>10.1f}")
+
+if __name__ == "__main__":
+    # one event loop for every run: the shared async client's connection pool is bound to it
+    asyncio.run(main())
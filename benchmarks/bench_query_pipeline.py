@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+A/B timing of the query pipelines: serial (enhance -> retrieve) vs speculative
+(raw-query retrieval overlapped with the enhancement call, adaptive skip).
+
+Usage (from the repository root, with Qdrant and the Gemini key configured):
+    python -m benchmarks.bench_query_pipeline --owner mvp_user --rounds 5
+
+Reports p50 time until retrieval is ready (the part the pipeline changes) and
+p50 end-to-end time, plus the overlap of retrieved chunks between modes as a
+recall sanity check.
+"""
+
+import argparse
+import asyncio
+import statistics
+
+from app.services.rag_service import answer_query, retrieve_for_query, should_skip_enhancement
+
+QUERIES = [
+    "what are the charges in this case",
+    "when was the FIR filed",
+    "was bail granted and on what conditions",
+    "Was bail granted under Section 437 CrPC to the accused in CR/CCPS/593/2025",
+    "which sections of the IT Act are invoked against the accused and what punishment do they carry",
+    "summarize this document",
+]
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--owner", default="mvp_user")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--end-to-end", action="store_true", help="also time answer generation")
+    args = parser.parse_args()
+
+    print(f"{'query':<42}{'skip':>6}{'serial ms':>11}{'spec ms':>10}{'overlap':>9}")
+    for query in QUERIES:
+        ready = {"serial": [], "speculative": []}
+        ids = {}
+        for _ in range(args.rounds):
+            for pipeline in ("serial", "speculative"):
+                if args.end_to_end:
+                    out = await answer_query(query, owner=args.owner, pipeline=pipeline)
+                    ready[pipeline].append(out["timings"]["total_ms"])
+                else:
+                    hits, timings = await retrieve_for_query(query, owner=args.owner, pipeline=pipeline)
+                    ready[pipeline].append(timings["retrieval_ready_ms"])
+                    ids[pipeline] = {hit["id"] for hit in hits}
+        overlap = ""
+        if ids.get("serial"):
+            overlap = f"{len(ids['serial'] & ids['speculative']) / len(ids['serial']):.0%}"
+        print(
+            f"{query[:40]:<42}{str(should_skip_enhancement(query)):>6}"
+            f"{statistics.median(ready['serial']):>11.1f}{statistics.median(ready['speculative']):>10.1f}{overlap:>9}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-user collections versus one shared, owner-filtered collection at many
+tenants: load time, search latency and memory of each layout.
+
+Usage (from the repository root; the qdrant backend needs QDRANT_URL):
+    python -m benchmarks.bench_tenancy_layouts --tenants 10000 --points 20 --dim 384
+    python -m benchmarks.bench_tenancy_layouts --backend local --tenants 1000
+
+Memory is Qdrant's resident set (memory_resident_bytes from /metrics) for the
+qdrant backend, and this process's RSS plus bytes on disk for the local one.
+Collections are created as bench_tenant_* / bench_shared and deleted afterwards.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+
+from app.utils.local_vector_store import LocalVectorStore
+from app.utils.vector_store import get_vector_store
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def qdrant_memory_bytes() -> int:
+    from app.utils.qdrant_client import QDRANT_URL, QDRANT_API_KEY
+    request = urllib.request.Request(f"{QDRANT_URL.rstrip('/')}/metrics")
+    if QDRANT_API_KEY:
+        request.add_header("api-key", QDRANT_API_KEY)
+    with urllib.request.urlopen(request) as response:
+        text = response.read().decode()
+    match = re.search(r"^memory_resident_bytes (\d+)", text, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+def disk_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files)
+
+def points_for(tenant: int, vectors: np.ndarray, owner: str = None):
+    return [
+        {"id": str(uuid.uuid4()), "vector": v.tolist(),
+         "payload": {"doc_id": tenant, "text": "x", **({"owner": owner} if owner else {})}}
+        for v in vectors
+    ]
+
+def measure(store, layout: str, data: np.ndarray, queries: np.ndarray, tenants_queried: np.ndarray,
+            top_k: int, memory) -> dict:
+    tenants, _, dim = data.shape
+    names = []
+    before = memory()
+    started = time.perf_counter()
+    try:
+        if layout == "shared":
+            names.append("bench_shared")
+            store.create_physical_collection("bench_shared", dim, multitenant=True)
+            batch = []
+            for tenant in range(tenants):
+                batch.extend(points_for(tenant, data[tenant], owner=f"t{tenant}"))
+                if len(batch) >= 1024:
+                    store.upsert("bench_shared", batch, wait=True)
+                    batch = []
+            if batch:
+                store.upsert("bench_shared", batch, wait=True)
+        else:
+            for tenant in range(tenants):
+                name = f"bench_tenant_{tenant}"
+                store.create_physical_collection(name, dim)
+                names.append(name)
+                store.upsert(name, points_for(tenant, data[tenant]), wait=True)
+        load = time.perf_counter() - started
+        loaded = memory()
+
+        def search(tenant: int, query: np.ndarray):
+            if layout == "shared":
+                return store.search("bench_shared", query.tolist(), top_k, owner=f"t{tenant}")
+            return store.search(f"bench_tenant_{tenant}", query.tolist(), top_k)
+
+        search(int(tenants_queried[0]), queries[0])  # warm-up
+        latencies = []
+        for tenant, query in zip(tenants_queried, queries):
+            started = time.perf_counter()
+            hits = search(int(tenant), query)
+            latencies.append(time.perf_counter() - started)
+            assert all(hit.payload["doc_id"] == tenant for hit in hits), "search crossed a tenant boundary"
+        return {
+            "load": load,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "memory": max(0, loaded - before),
+            "collections": len(names),
+        }
+    finally:
+        for name in names:
+            store.delete_collection(name)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, default=10000)
+    parser.add_argument("--points", type=int, default=20, help="points per tenant")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backend", default="qdrant", choices=["local", "qdrant"])
+    parser.add_argument("--layouts", nargs="+", default=["per_user", "shared"], choices=["per_user", "shared"])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_tenancy_")
+    if args.backend == "local":
+        store = LocalVectorStore(directory)
+        memory = lambda: rss_bytes() + disk_bytes(directory)
+    else:
+        store = get_vector_store("qdrant")
+        memory = qdrant_memory_bytes
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((args.tenants, args.points, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    tenants_queried = rng.integers(0, args.tenants, size=args.queries)
+
+    print(f"{args.tenants} tenants x {args.points} points, dim {args.dim}, backend {args.backend}")
+    print(f"{'layout':>9}{'colls':>7}{'load s':>9}{'p50 ms':>9}{'p99 ms':>9}{'memory MB':>11}")
+    try:
+        for layout in args.layouts:
+            r = measure(store, layout, data, queries, tenants_queried, args.top_k, memory)
+            print(f"{layout:>9}{r['collections']:>7}{r['load']:>9.1f}{r['p50'] * 1000:>9.2f}"
+                  f"{r['p99'] * 1000:>9.2f}{r['memory'] / 2**20:>11.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Search latency of the two vector-store backends as a collection grows, to find
+the size at which the Qdrant server overtakes the embedded brute-force index.
+
+Usage (from the repository root; the qdrant backend needs QDRANT_URL):
+    python -m benchmarks.bench_vector_backends --sizes 1000 10000 50000 100000 --dim 768
+    python -m benchmarks.bench_vector_backends --backends local   # no server
+
+Collections are created as bench_backend_<size> and deleted afterwards.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.utils.local_vector_store import LocalVectorStore
+from app.utils.vector_store import get_vector_store
+
+def percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+def measure(store, name: str, vectors: np.ndarray, queries: np.ndarray, top_k: int, batch: int = 256):
+    store.create_physical_collection(name, vectors.shape[1])
+    try:
+        started = time.perf_counter()
+        for start in range(0, len(vectors), batch):
+            store.upsert(name, [
+                {"id": str(uuid.uuid4()), "vector": v.tolist(), "payload": {"doc_id": (start + i) // 100}}
+                for i, v in enumerate(vectors[start:start + batch])
+            ], wait=True)
+        build = time.perf_counter() - started
+        store.search(name, queries[0].tolist(), top_k)  # warm-up
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            store.search(name, query.tolist(), top_k)
+            latencies.append(time.perf_counter() - started)
+        return build, percentile(latencies, 50), percentile(latencies, 99)
+    finally:
+        store.delete_collection(name)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=["local", "qdrant"], choices=["local", "qdrant"])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_vectors_")
+    stores = {
+        backend: LocalVectorStore(directory) if backend == "local" else get_vector_store("qdrant")
+        for backend in args.backends
+    }
+    rng = np.random.default_rng(0)
+    crossover = None
+    print(f"{'size':>8}{'backend':>9}{'build s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    try:
+        for size in args.sizes:
+            vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+            queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+            p50 = {}
+            for backend, store in stores.items():
+                build, p50[backend], p99 = measure(store, f"bench_backend_{size}", vectors, queries, args.top_k)
+                print(f"{size:>8}{backend:>9}{build:>9.1f}{p50[backend] * 1000:>9.2f}{p99 * 1000:>9.2f}")
+            if crossover is None and len(p50) == 2 and p50["qdrant"] < p50["local"]:
+                crossover = size
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if len(stores) == 2:
+        print(f"Qdrant faster from: {crossover if crossover else 'not reached'} points (dim {args.dim})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.utils.llm_scheduler import LLMScheduler
+
+def make_scheduler(concurrency: int = 2) -> LLMScheduler:
+    return LLMScheduler({}, default_rpm=0, concurrency=concurrency, max_retries=0)
+
+def test_cancelled_stream_open_releases_slot():
+    scheduler = make_scheduler(concurrency=2)
+
+    async def never_opens():
+        await asyncio.Event().wait()
+
+    async def consume():
+        async with scheduler.stream("model", never_opens):
+            pass
+
+    async def ok():
+        return "done"
+
+    async def main():
+        # the client goes away while each stream is still opening
+        for _ in range(2):
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        # both slots must be free again, or this waits forever
+        return await asyncio.wait_for(scheduler.run("model", ok), timeout=1)
+
+    assert asyncio.run(main()) == "done"
+    assert scheduler.gate("model").slots._used == 0
+
+def test_cancelled_stream_body_releases_slot():
+    scheduler = make_scheduler(concurrency=1)
+
+    async def opens():
+        return "stream"
+
+    async def consume():
+        async with scheduler.stream("model", opens):
+            await asyncio.Event().wait()
+
+    async def ok():
+        return "done"
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return await asyncio.wait_for(scheduler.run("model", ok), timeout=1)
+
+    assert asyncio.run(main()) == "done"